@@ -2,25 +2,67 @@
 
 from __future__ import annotations
 
+import errno
 import hashlib
+import logging
+import mmap
 import os
+import queue
+import re
 import sqlite3
+import sys
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
 from dataclasses import dataclass
-from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
+
+try:
+    import blake3
+except ImportError:  # pragma: no cover - optional speedup; SHA-256 works everywhere
+    blake3 = None
 
 DATA_DIR = Path(os.getenv("PIRATEBOX_DATA_DIR", "./data"))
 DB_PATH = Path(os.getenv("PIRATEBOX_DB_PATH", DATA_DIR / "piratebox.db"))
 FILES_DIR = Path(os.getenv("PIRATEBOX_FILES_DIR", DATA_DIR / "files"))
 MAX_UPLOAD_MB = int(os.getenv("PIRATEBOX_MAX_UPLOAD_MB", "512"))
+UPLOAD_CHUNK_BYTES = 4 * 1024 * 1024
+# Stored in files.sha256 while a deferred hash is still being computed.
+HASH_PENDING = ""
+# Digest stored in files.sha256 (the column predates the option); blake3 needs its package.
+HASH_ALGO = (
+    "blake3"
+    if os.getenv("PIRATEBOX_HASH_ALGO", "sha256").strip().lower() == "blake3" and blake3 is not None
+    else "sha256"
+)
+
+_WS_RE = re.compile(r"\s+")
+_log = logging.getLogger(__name__)
 
 MAX_NICKNAME_LEN = int(os.getenv("PIRATEBOX_MAX_NICKNAME_LEN", "32"))
 MAX_MESSAGE_LEN = int(os.getenv("PIRATEBOX_MAX_MESSAGE_LEN", "500"))
 MAX_THREAD_TITLE_LEN = int(os.getenv("PIRATEBOX_MAX_THREAD_TITLE_LEN", "120"))
+DB_READERS = max(1, int(os.getenv("PIRATEBOX_DB_READERS", "4")))
+
+# Five pooled connections mapping 256 MiB each would eat a third of a 32-bit
+# (armhf Raspberry Pi OS) address space, so only 64-bit builds memory-map the DB.
+_MMAP_BYTES = 268435456 if sys.maxsize > 2**32 else 0
+
+# Per-connection tuning. The box is local-only, so WAL + synchronous=NORMAL is plenty durable.
+_CONN_PRAGMAS = f"""
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size={_MMAP_BYTES};
+PRAGMA cache_size=-20000;
+PRAGMA wal_autocheckpoint=1000;
+"""
 
 
+# Rows are unpacked positionally (`StoredFile(*row)`), so SELECT column order must
+# match the field order below.
 @dataclass(frozen=True)
 class StoredFile:
     """Metadata for an uploaded file sitting on disk."""
@@ -64,29 +106,241 @@ class ForumPost:
 
 def _utc_now() -> str:
     """Return a UTC timestamp without microseconds for predictable storage."""
-    return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+    tm = time.gmtime(int(time.time()))
+    return (
+        f"{tm.tm_year:04d}-{tm.tm_mon:02d}-{tm.tm_mday:02d}"
+        f"T{tm.tm_hour:02d}:{tm.tm_min:02d}:{tm.tm_sec:02d}+00:00"
+    )
+
+
+def _is_memory_db(path: Path | str) -> bool:
+    """Tell whether the DB is a shared-cache in-memory URI, as the test suite uses."""
+    target = str(path)
+    return target.startswith("file:") and "mode=memory" in target
 
 
 def ensure_storage() -> None:
     """Create storage directories so the app can pretend it's organized."""
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    if not _is_memory_db(DB_PATH):
+        Path(DB_PATH).parent.mkdir(parents=True, exist_ok=True)
     FILES_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def _connect() -> sqlite3.Connection:
-    """Open a SQLite connection with row dictionaries."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+class _ConnPool:
+    """One writer plus a handful of read-only connections, opened once and reused."""
+
+    def __init__(self, path: Path | str, readers: int) -> None:
+        self.path = path
+        memory = _is_memory_db(path)
+        self._write_lock = threading.Lock()
+        self._writer = self._open(str(path), uri=memory, isolation_level=None)
+        self._readers: queue.Queue[sqlite3.Connection] = queue.Queue()
+        for _ in range(readers):
+            if memory:
+                # mode=ro would turn the URI into a different (empty) database; query_only
+                # keeps readers honest, and read_uncommitted stops shared-cache table locks
+                # from failing reads while the writer holds a transaction.
+                conn = self._open(str(path), uri=True)
+                conn.executescript("PRAGMA query_only=ON; PRAGMA read_uncommitted=ON;")
+            else:
+                # as_uri() escapes the ?, # and % that a raw "file:" string would misread.
+                conn = self._open(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+            self._readers.put(conn)
+
+    @staticmethod
+    def _open(
+        target: str, *, uri: bool = False, isolation_level: Optional[str] = ""
+    ) -> sqlite3.Connection:
+        """Open a SQLite connection with row dictionaries, shareable across threads."""
+        conn = sqlite3.connect(
+            target, uri=uri, check_same_thread=False, isolation_level=isolation_level
+        )
+        conn.row_factory = sqlite3.Row
+        conn.executescript(_CONN_PRAGMAS)
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection and hand it back when done."""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Hold the single (autocommit) writer connection under its lock."""
+        with self._write_lock:
+            yield self._writer
+
+    def close(self) -> None:
+        """Close every connection owned by the pool."""
+        with self._write_lock:
+            self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool: Optional[_ConnPool] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> _ConnPool:
+    """Return the pool for the current DB_PATH, reopening it if the path moved."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.path != DB_PATH:
+            if _pool is not None:
+                _pool.close()
+            _pool = _ConnPool(DB_PATH, DB_READERS)
+            _reset_caches()
+        return _pool
+
+
+def close_db() -> None:
+    """Close pooled connections; the next query reopens them."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+@contextmanager
+def _txn(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Run a block inside BEGIN IMMEDIATE so a batch of writes pays for one commit."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+@contextmanager
+def read_conn() -> Iterator[sqlite3.Connection]:
+    """Borrow a pooled read-only connection."""
+    with _get_pool().reader() as conn:
+        yield conn
+
+
+@contextmanager
+def write_conn() -> Iterator[sqlite3.Connection]:
+    """Borrow the pooled writer connection inside a single write transaction."""
+    with _get_pool().writer() as conn, _txn(conn):
+        yield conn
+
+
+class _VersionedCache:
+    """Remember read results until the next write bumps the version."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entries: dict[object, tuple[int, list]] = {}
+
+    @property
+    def version(self) -> int:
+        """Version to capture before reading, so a racing write discards the result."""
+        return self._version
+
+    def get(self, key: object) -> Optional[list]:
+        """Return a copy of the cached value, or None when missing or stale."""
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None or hit[0] != self._version:
+                return None
+            return list(hit[1])
+
+    def put(self, key: object, version: int, value: list) -> None:
+        """Store a value read at `version`, unless a write has landed since."""
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = (version, list(value))
+
+    def bump(self) -> None:
+        """Invalidate everything after a write commits."""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+
+class _RecordCache:
+    """Small LRU of single rows by id, invalidated key by key on write."""
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self._lock = threading.Lock()
+        self._maxsize = maxsize
+        self._generation = 0
+        self._entries: OrderedDict[int, object] = OrderedDict()
+
+    @property
+    def generation(self) -> int:
+        """Generation to capture before reading, so a racing write discards the result."""
+        return self._generation
+
+    def get(self, key: int) -> Optional[object]:
+        """Return the cached row, or None on a miss."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: int, generation: int, value: object) -> None:
+        """Store a row read at `generation`, unless a write has landed since."""
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: int) -> None:
+        """Forget one row after it changed."""
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Forget every row."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+_threads_cache = _VersionedCache()
+_files_cache = _VersionedCache()
+_thread_by_id = _RecordCache()
+_file_by_id = _RecordCache()
+
+
+def _reset_caches() -> None:
+    """Drop cached reads, e.g. when the database underneath is swapped."""
+    _threads_cache.bump()
+    _files_cache.bump()
+    _thread_by_id.clear()
+    _file_by_id.clear()
 
 
 def init_db() -> None:
     """Initialize SQLite tables if they do not exist."""
     ensure_storage()
-    with _connect() as conn:
+    _reset_caches()
+    with _get_pool().writer() as conn:
+        if _is_memory_db(DB_PATH):
+            # Nothing to recover after a crash, so skip the journal file work entirely.
+            conn.executescript("PRAGMA journal_mode=MEMORY; PRAGMA synchronous=OFF;")
+        else:
+            conn.execute("PRAGMA journal_mode=WAL")
         conn.executescript(
             """
-            PRAGMA journal_mode=WAL;
             CREATE TABLE IF NOT EXISTS files (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 original_name TEXT NOT NULL,
@@ -105,7 +359,9 @@ def init_db() -> None:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 title TEXT NOT NULL,
                 nickname TEXT NOT NULL,
-                created_at TEXT NOT NULL
+                created_at TEXT NOT NULL,
+                post_count INTEGER NOT NULL DEFAULT 0,
+                last_activity TEXT
             );
             CREATE TABLE IF NOT EXISTS forum_posts (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -115,13 +371,37 @@ def init_db() -> None:
                 created_at TEXT NOT NULL,
                 FOREIGN KEY(thread_id) REFERENCES forum_threads(id) ON DELETE CASCADE
             );
+            CREATE INDEX IF NOT EXISTS idx_forum_posts_thread_id ON forum_posts(thread_id);
+            """
+        )
+        _migrate_thread_counters(conn)
+        conn.execute("PRAGMA optimize")
+
+
+def _migrate_thread_counters(conn: sqlite3.Connection) -> None:
+    """Add and backfill the denormalized thread counters on databases that predate them."""
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(forum_threads)")}
+    if "post_count" in columns:
+        return
+    with _txn(conn):
+        conn.execute("ALTER TABLE forum_threads ADD COLUMN post_count INTEGER NOT NULL DEFAULT 0")
+        conn.execute("ALTER TABLE forum_threads ADD COLUMN last_activity TEXT")
+        conn.execute(
+            """
+            UPDATE forum_threads
+            SET post_count = (SELECT COUNT(*) FROM forum_posts p WHERE p.thread_id = forum_threads.id),
+                last_activity = (SELECT MAX(created_at) FROM forum_posts p WHERE p.thread_id = forum_threads.id)
             """
         )
 
 
 def list_files(limit: int = 200) -> list[StoredFile]:
     """Return recent files, newest first, capped at `limit`."""
-    with _connect() as conn:
+    cached = _files_cache.get(limit)
+    if cached is not None:
+        return cached
+    version = _files_cache.version
+    with read_conn() as conn:
         rows = conn.execute(
             """
             SELECT id, original_name, stored_name, size_bytes, sha256, uploaded_at
@@ -131,12 +411,18 @@ def list_files(limit: int = 200) -> list[StoredFile]:
             """,
             (limit,),
         ).fetchall()
-    return [StoredFile(**row) for row in rows]
+    files = [StoredFile(*row) for row in rows]
+    _files_cache.put(limit, version, files)
+    return files
 
 
 def get_file(file_id: int) -> Optional[StoredFile]:
     """Fetch a single file record by id."""
-    with _connect() as conn:
+    cached = _file_by_id.get(file_id)
+    if cached is not None:
+        return cached
+    generation = _file_by_id.generation
+    with read_conn() as conn:
         row = conn.execute(
             """
             SELECT id, original_name, stored_name, size_bytes, sha256, uploaded_at
@@ -145,12 +431,16 @@ def get_file(file_id: int) -> Optional[StoredFile]:
             """,
             (file_id,),
         ).fetchone()
-    return StoredFile(**row) if row else None
+    if not row:
+        return None
+    record = StoredFile(*row)
+    _file_by_id.put(file_id, generation, record)
+    return record
 
 
 def insert_file(original_name: str, stored_name: str, size_bytes: int, sha256: str) -> int:
     """Persist file metadata and return the new id."""
-    with _connect() as conn:
+    with write_conn() as conn:
         cur = conn.execute(
             """
             INSERT INTO files (original_name, stored_name, size_bytes, sha256, uploaded_at)
@@ -158,14 +448,14 @@ def insert_file(original_name: str, stored_name: str, size_bytes: int, sha256: s
             """,
             (original_name, stored_name, size_bytes, sha256, _utc_now()),
         )
-        conn.commit()
-        return int(cur.lastrowid)
+    _files_cache.bump()
+    return int(cur.lastrowid)
 
 
-def list_chat_messages(after_id: int = 0, limit: int = 200) -> list[ChatMessage]:
-    """Return chat messages after a given id."""
-    with _connect() as conn:
-        rows = conn.execute(
+def _fetch_chat_rows(after_id: int, limit: int) -> list[sqlite3.Row]:
+    """Fetch raw chat rows after a given id, oldest first."""
+    with read_conn() as conn:
+        return conn.execute(
             """
             SELECT id, nickname, message, created_at
             FROM chat_messages
@@ -175,61 +465,92 @@ def list_chat_messages(after_id: int = 0, limit: int = 200) -> list[ChatMessage]
             """,
             (after_id, limit),
         ).fetchall()
-    return [ChatMessage(**row) for row in rows]
+
+
+def list_chat_messages(after_id: int = 0, limit: int = 200) -> list[ChatMessage]:
+    """Return chat messages after a given id."""
+    return [ChatMessage(*row) for row in _fetch_chat_rows(after_id, limit)]
+
+
+def list_chat_messages_raw(after_id: int = 0, limit: int = 200) -> list[dict]:
+    """Return chat messages after a given id as plain dicts, ready for JSON."""
+    return [dict(row) for row in _fetch_chat_rows(after_id, limit)]
 
 
 def insert_chat_message(nickname: str, message: str) -> ChatMessage:
     """Insert a chat message and return the stored row."""
+    return insert_chat_messages([(nickname, message)])[0]
+
+
+_INSERT_CHAT_SQL = """
+    INSERT INTO chat_messages (nickname, message, created_at)
+    VALUES (?, ?, ?)
+"""
+
+
+def insert_chat_messages(entries: list[tuple[str, str]]) -> list[ChatMessage]:
+    """Insert a batch of (nickname, message) pairs in one transaction."""
+    if not entries:
+        return []
     created_at = _utc_now()
-    with _connect() as conn:
-        cur = conn.execute(
-            """
-            INSERT INTO chat_messages (nickname, message, created_at)
-            VALUES (?, ?, ?)
-            """,
-            (nickname, message, created_at),
-        )
-        conn.commit()
-        msg_id = int(cur.lastrowid)
-    return ChatMessage(id=msg_id, nickname=nickname, message=message, created_at=created_at)
+    with write_conn() as conn:
+        conn.executemany(_INSERT_CHAT_SQL, [(nickname, message, created_at) for nickname, message in entries])
+        # executemany leaves cursor.lastrowid alone, so ask SQLite. With the only writer
+        # inside BEGIN IMMEDIATE, AUTOINCREMENT handed the batch consecutive ids.
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    first_id = last_id - len(entries) + 1
+    return [
+        ChatMessage(id=first_id + offset, nickname=nickname, message=message, created_at=created_at)
+        for offset, (nickname, message) in enumerate(entries)
+    ]
 
 
 def list_threads(limit: int = 200) -> list[ForumThread]:
     """List threads with counts and last activity, newest first."""
-    with _connect() as conn:
+    cached = _threads_cache.get(limit)
+    if cached is not None:
+        return cached
+    version = _threads_cache.version
+    with read_conn() as conn:
         rows = conn.execute(
             """
-            SELECT t.id, t.title, t.nickname, t.created_at,
-                   (SELECT COUNT(*) FROM forum_posts p WHERE p.thread_id = t.id) AS post_count,
-                   (SELECT MAX(created_at) FROM forum_posts p WHERE p.thread_id = t.id) AS last_activity
-            FROM forum_threads t
-            ORDER BY t.id DESC
+            SELECT id, title, nickname, created_at, post_count, last_activity
+            FROM forum_threads
+            ORDER BY id DESC
             LIMIT ?
             """,
             (limit,),
         ).fetchall()
-    return [ForumThread(**row) for row in rows]
+    threads = [ForumThread(*row) for row in rows]
+    _threads_cache.put(limit, version, threads)
+    return threads
 
 
 def get_thread(thread_id: int) -> Optional[ForumThread]:
     """Fetch a forum thread summary by id."""
-    with _connect() as conn:
+    cached = _thread_by_id.get(thread_id)
+    if cached is not None:
+        return cached
+    generation = _thread_by_id.generation
+    with read_conn() as conn:
         row = conn.execute(
             """
-            SELECT t.id, t.title, t.nickname, t.created_at,
-                   (SELECT COUNT(*) FROM forum_posts p WHERE p.thread_id = t.id) AS post_count,
-                   (SELECT MAX(created_at) FROM forum_posts p WHERE p.thread_id = t.id) AS last_activity
-            FROM forum_threads t
-            WHERE t.id = ?
+            SELECT id, title, nickname, created_at, post_count, last_activity
+            FROM forum_threads
+            WHERE id = ?
             """,
             (thread_id,),
         ).fetchone()
-    return ForumThread(**row) if row else None
+    if not row:
+        return None
+    thread = ForumThread(*row)
+    _thread_by_id.put(thread_id, generation, thread)
+    return thread
 
 
 def list_posts(thread_id: int) -> list[ForumPost]:
     """List posts for a specific thread, oldest first."""
-    with _connect() as conn:
+    with read_conn() as conn:
         rows = conn.execute(
             """
             SELECT id, thread_id, nickname, message, created_at
@@ -239,45 +560,50 @@ def list_posts(thread_id: int) -> list[ForumPost]:
             """,
             (thread_id,),
         ).fetchall()
-    return [ForumPost(**row) for row in rows]
+    return [ForumPost(*row) for row in rows]
+
+
+# Shared by create_thread and insert_post so both hit the same cached prepared statement.
+_INSERT_POST_SQL = """
+    INSERT INTO forum_posts (thread_id, nickname, message, created_at)
+    VALUES (?, ?, ?, ?)
+"""
 
 
 def create_thread(title: str, nickname: str, message: str) -> int:
     """Create a thread and its first post, then return the thread id."""
     created_at = _utc_now()
-    with _connect() as conn:
-        cur = conn.execute(
+    with write_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
             """
-            INSERT INTO forum_threads (title, nickname, created_at)
-            VALUES (?, ?, ?)
+            INSERT INTO forum_threads (title, nickname, created_at, post_count, last_activity)
+            VALUES (?, ?, ?, 1, ?)
             """,
-            (title, nickname, created_at),
+            (title, nickname, created_at, created_at),
         )
         thread_id = int(cur.lastrowid)
-        conn.execute(
-            """
-            INSERT INTO forum_posts (thread_id, nickname, message, created_at)
-            VALUES (?, ?, ?, ?)
-            """,
-            (thread_id, nickname, message, created_at),
-        )
-        conn.commit()
+        cur.execute(_INSERT_POST_SQL, (thread_id, nickname, message, created_at))
+    _threads_cache.bump()
     return thread_id
 
 
 def insert_post(thread_id: int, nickname: str, message: str) -> ForumPost:
     """Insert a reply into a thread and return the stored post."""
     created_at = _utc_now()
-    with _connect() as conn:
-        cur = conn.execute(
+    with write_conn() as conn:
+        cur = conn.execute(_INSERT_POST_SQL, (thread_id, nickname, message, created_at))
+        post_id = int(cur.lastrowid)
+        conn.execute(
             """
-            INSERT INTO forum_posts (thread_id, nickname, message, created_at)
-            VALUES (?, ?, ?, ?)
+            UPDATE forum_threads
+            SET post_count = post_count + 1, last_activity = ?
+            WHERE id = ?
             """,
-            (thread_id, nickname, message, created_at),
+            (created_at, thread_id),
         )
-        conn.commit()
-        post_id = int(cur.lastrowid)
+    _threads_cache.bump()
+    _thread_by_id.discard(thread_id)
     return ForumPost(
         id=post_id,
         thread_id=thread_id,
@@ -287,11 +613,20 @@ def insert_post(thread_id: int, nickname: str, message: str) -> ForumPost:
     )
 
 
+def _collapse_whitespace(value: str) -> str:
+    """Strip and squash whitespace runs to single spaces, skipping the regex when clean."""
+    clean = value.strip()
+    # isprintable() is False for every whitespace char except a plain space.
+    if "  " in clean or not clean.isprintable():
+        clean = _WS_RE.sub(" ", clean)
+    return clean
+
+
 def normalize_nickname(value: Optional[str]) -> str:
     """Normalize nicknames to something short and vaguely human."""
     if not value:
         return "Anonymous"
-    clean = " ".join(value.strip().split())
+    clean = _collapse_whitespace(value)
     if not clean:
         return "Anonymous"
     return clean[:MAX_NICKNAME_LEN]
@@ -301,38 +636,144 @@ def normalize_message(value: Optional[str], *, max_len: int) -> str:
     """Trim and collapse whitespace, then enforce a max length."""
     if not value:
         return ""
-    clean = " ".join(value.strip().split())
-    return clean[:max_len]
+    return _collapse_whitespace(value)[:max_len]
+
 
+def _write_all(fd: int, data: bytes) -> None:
+    """Write every byte, looping over short writes."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
 
-def store_upload(file_obj, original_name: str) -> StoredFile:
-    """Stream an upload to disk, hash it, and save metadata."""
+
+def _sync_data(fd: int) -> None:
+    """Flush file data to disk; macOS has no fdatasync, so fall back to fsync."""
+    getattr(os, "fdatasync", os.fsync)(fd)
+
+
+def _new_hasher():
+    """Return a fresh hasher for HASH_ALGO; BLAKE3 may use every core it finds."""
+    if HASH_ALGO == "blake3":
+        return blake3.blake3(max_threads=blake3.blake3.AUTO)
+    return hashlib.sha256()
+
+
+def _file_hexdigest(handle) -> str:
+    """Hash an open file with HASH_ALGO, without Python-level chunk loops."""
+    if HASH_ALGO != "blake3":
+        return hashlib.file_digest(handle, "sha256").hexdigest()
+    hasher = _new_hasher()
+    # One update over a mapping lets BLAKE3 split the work across threads; empty files can't be mapped.
+    if os.fstat(handle.fileno()).st_size:
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            hasher.update(view)
+    return hasher.hexdigest()
+
+
+def _disk_fileno(file_obj) -> Optional[int]:
+    """Return the fd behind an upload, unless it only lives in memory."""
+    # SpooledTemporaryFile.fileno() would force an in-memory spool onto disk first.
+    if not getattr(file_obj, "_rolled", True):
+        return None
+    try:
+        return file_obj.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+# In-kernel file-to-file copies, best first: (src, dst, src_offset, count) -> bytes copied.
+_KERNEL_COPIES = tuple(
+    copy
+    for name, copy in (
+        ("copy_file_range", lambda src, dst, offset, count: os.copy_file_range(src, dst, count, offset)),
+        ("sendfile", lambda src, dst, offset, count: os.sendfile(dst, src, offset, count)),
+    )
+    if hasattr(os, name)
+)
+# What a copy raises when this kernel or filesystem pair cannot do it; anything else is real.
+_COPY_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP}
+
+
+def _copy_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    """Copy bytes from src at `offset` to dst's position without a trip through Python."""
+    copied = 0
+    for copy in _KERNEL_COPIES:
+        try:
+            while copied < count:
+                sent = copy(src_fd, dst_fd, offset + copied, count - copied)
+                if not sent:
+                    return copied
+                copied += sent
+            return copied
+        except OSError as exc:
+            if exc.errno not in _COPY_UNSUPPORTED:
+                raise
+    while copied < count:
+        chunk = os.pread(src_fd, min(UPLOAD_CHUNK_BYTES, count - copied), offset + copied)
+        if not chunk:
+            break
+        _write_all(dst_fd, chunk)
+        copied += len(chunk)
+    return copied
+
+
+def _drop_page_cache(fd: int) -> None:
+    """Evict a file's clean pages so big uploads don't push SQLite out of the page cache."""
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def store_upload(file_obj, original_name: str, *, defer_hash: bool = False) -> StoredFile:
+    """Stream an upload to disk, hash it, and save metadata.
+
+    With `defer_hash`, the row is saved with HASH_PENDING and `finalize_upload`
+    is expected to fill in the digest later, off the request path.
+    """
     stored_name = uuid.uuid4().hex
     target_path = FILES_DIR / stored_name
     size_bytes = 0
-    digest = hashlib.sha256()
+    max_bytes = MAX_UPLOAD_MB * 1024 * 1024
+    digest = None if defer_hash else _new_hasher()
+    # Nothing to hash on the way through, so an on-disk spool can be copied inside the kernel.
+    src_fd = None if digest is not None else _disk_fileno(file_obj)
 
     try:
-        with target_path.open("wb") as target:
-            while True:
-                chunk = file_obj.read(1024 * 1024)
-                if not chunk:
-                    break
-                size_bytes += len(chunk)
-                if size_bytes > MAX_UPLOAD_MB * 1024 * 1024:
+        fd = os.open(target_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            if src_fd is not None:
+                file_obj.flush()
+                start = file_obj.tell()
+                remaining = os.fstat(src_fd).st_size - start
+                if remaining > max_bytes:
                     raise ValueError("File too large")
-                digest.update(chunk)
-                target.write(chunk)
+                size_bytes = _copy_range(src_fd, fd, start, remaining)
+                file_obj.seek(start + size_bytes)
+            else:
+                # Big chunks keep hashlib in OpenSSL with the GIL released.
+                while chunk := file_obj.read(UPLOAD_CHUNK_BYTES):
+                    size_bytes += len(chunk)
+                    if size_bytes > max_bytes:
+                        raise ValueError("File too large")
+                    if digest is not None:
+                        digest.update(chunk)
+                    _write_all(fd, chunk)
+            _sync_data(fd)
+            # A deferred hash is about to read the file back, so keep it cached until then.
+            if digest is not None:
+                _drop_page_cache(fd)
+        finally:
+            os.close(fd)
     except Exception:
         if target_path.exists():
             target_path.unlink()
         raise
 
+    sha256 = digest.hexdigest() if digest is not None else HASH_PENDING
     file_id = insert_file(
         original_name=original_name,
         stored_name=stored_name,
         size_bytes=size_bytes,
-        sha256=digest.hexdigest(),
+        sha256=sha256,
     )
 
     return StoredFile(
@@ -340,6 +781,36 @@ def store_upload(file_obj, original_name: str) -> StoredFile:
         original_name=original_name,
         stored_name=stored_name,
         size_bytes=size_bytes,
-        sha256=digest.hexdigest(),
+        sha256=sha256,
         uploaded_at=_utc_now(),
     )
+
+
+def finalize_upload(file_id: int) -> Optional[str]:
+    """Hash a deferred upload from disk and record the digest; None if that did not happen.
+
+    Failures are logged, not raised: the row stays at HASH_PENDING and
+    `finalize_pending_uploads` has another go at the next startup.
+    """
+    try:
+        record = get_file(file_id)
+        if record is None:
+            return None
+        with (FILES_DIR / record.stored_name).open("rb") as handle:
+            sha256 = _file_hexdigest(handle)
+            _drop_page_cache(handle.fileno())
+        with write_conn() as conn:
+            conn.execute("UPDATE files SET sha256 = ? WHERE id = ?", (sha256, file_id))
+    except Exception:
+        _log.exception("Hashing upload %s failed; will retry at next startup", file_id)
+        return None
+    _files_cache.bump()
+    _file_by_id.discard(file_id)
+    return sha256
+
+
+def finalize_pending_uploads() -> int:
+    """Hash every upload a crash or restart left at HASH_PENDING; returns how many got one."""
+    with read_conn() as conn:
+        rows = conn.execute("SELECT id FROM files WHERE sha256 = ?", (HASH_PENDING,)).fetchall()
+    return sum(finalize_upload(row["id"]) is not None for row in rows)
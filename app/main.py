@@ -2,11 +2,13 @@
 
 from __future__ import annotations
 
+import asyncio
 import os
 from contextlib import asynccontextmanager
+from functools import lru_cache
 from typing import Optional
 
-from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi import BackgroundTasks, FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.responses import (
     FileResponse,
     HTMLResponse,
@@ -16,6 +18,8 @@ from fastapi.responses import (
 )
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+from starlette.concurrency import run_in_threadpool
 from starlette.responses import Response
 
 try:
@@ -23,23 +27,145 @@ try:
 except ImportError:  # pragma: no cover - fallback for `python app/main.py`
     import db
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback when no orjson wheel exists
+    orjson = None
+    import json
+
 APP_NAME = os.getenv("PIRATEBOX_NAME", "PirateBox")
+CHAT_BATCH_MS = int(os.getenv("PIRATEBOX_CHAT_BATCH_MS", "20"))
+TEMPLATE_CACHE_DIR = os.getenv("PIRATEBOX_TEMPLATE_CACHE_DIR", "").strip()
+CHAT_LONG_POLL_SECONDS = float(os.getenv("PIRATEBOX_CHAT_LONG_POLL_SECONDS", "25"))
+
+
+class ChatBatcher:
+    """Coalesce chat posts that arrive close together into one SQLite transaction."""
+
+    def __init__(self, window_ms: int) -> None:
+        self.window = max(0, window_ms) / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # The batch the flusher has taken off the queue but not answered yet.
+        self._batch: list[tuple[tuple[str, str], asyncio.Future]] = []
+
+    def start(self) -> None:
+        """Spin up the flusher on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and fail anything still waiting in line."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        for _, future in self._batch:
+            future.cancel()
+        self._batch = []
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+
+    async def submit(self, nickname: str, message: str) -> db.ChatMessage:
+        """Queue a message for the next batch and wait for its stored row."""
+        if self._task is None or self._task.done():
+            return await run_in_threadpool(db.insert_chat_message, nickname, message)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((nickname, message), future))
+        return await future
+
+    async def _run(self) -> None:
+        """Wait for a post, linger for the batch window, then flush everything queued."""
+        while True:
+            batch = self._batch = [await self._queue.get()]
+            if self.window:
+                await asyncio.sleep(self.window)
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                stored = await run_in_threadpool(
+                    db.insert_chat_messages, [entry for entry, _ in batch]
+                )
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            for (_, future), msg in zip(batch, stored):
+                if not future.done():
+                    future.set_result(msg)
+
+
+class ChatFeed:
+    """Wake long-polling chat clients as soon as new messages are stored."""
+
+    def __init__(self) -> None:
+        self._event: Optional[asyncio.Event] = None
+
+    def current(self) -> asyncio.Event:
+        """Return the event the next notify() will set; grab it before querying."""
+        if self._event is None:
+            self._event = asyncio.Event()
+        return self._event
+
+    def notify(self) -> None:
+        """Release every waiter and start a fresh generation."""
+        if self._event is not None:
+            self._event.set()
+            self._event = None
+
+    def reset(self) -> None:
+        """Forget any event tied to a previous event loop."""
+        self._event = None
+
+
+chat_batcher = ChatBatcher(CHAT_BATCH_MS)
+chat_feed = ChatFeed()
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     """Boot the database before the app starts pretending everything is fine."""
     db.init_db()
+    # Uploads whose background hash never ran would say "verifying" forever.
+    await run_in_threadpool(db.finalize_pending_uploads)
+    chat_feed.reset()
+    chat_batcher.start()
     yield
+    chat_feed.notify()
+    await chat_batcher.stop()
+    db.close_db()
 
 
 app = FastAPI(title=APP_NAME, lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-templates = Jinja2Templates(directory="app/templates")
+
+def _template_env() -> Environment:
+    """Build a Jinja env that compiles each template once and caches the bytecode."""
+    if TEMPLATE_CACHE_DIR:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+    else:
+        bytecode_cache = FileSystemBytecodeCache()
+    return Environment(
+        loader=FileSystemLoader("app/templates"),
+        autoescape=select_autoescape(),
+        bytecode_cache=bytecode_cache,
+        auto_reload=False,
+    )
+
+
+templates = Jinja2Templates(env=_template_env())
 
 
+@lru_cache(maxsize=4096)
 def _format_size(num_bytes: int) -> str:
     """Turn raw bytes into something a human can pretend to parse."""
     step = 1024.0
@@ -51,6 +177,7 @@ def _format_size(num_bytes: int) -> str:
     return f"{size:.1f} PB"
 
 
+@lru_cache(maxsize=4096)
 def _format_time(value: str) -> str:
     """Make timestamps look less like a ransom note from UTC."""
     return value.replace("T", " ").replace("+00:00", " UTC")
@@ -65,6 +192,26 @@ def _safe_next(raw: Optional[str]) -> str:
     return "/"
 
 
+def _json_response(payload: dict) -> Response:
+    """Serialize JSON with orjson when available and skip the pydantic encoder."""
+    if orjson is not None:
+        body = orjson.dumps(payload)
+    else:  # pragma: no cover - exercised only without orjson installed
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return Response(body, media_type="application/json")
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag, weak validators included."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
 def _captive_acknowledged(request: Request) -> bool:
     """Check whether the captive portal has been waved away already."""
     return request.cookies.get("piratebox_captive_ack") == "1"
@@ -132,7 +279,11 @@ def files_page(request: Request) -> HTMLResponse:
 
 
 @app.post("/files/upload")
-def upload_file(request: Request, file: UploadFile = File(...)) -> RedirectResponse:
+def upload_file(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+) -> RedirectResponse:
     """Accept an upload, scan it for size limits, and stash it on disk."""
     if not file.filename:
         raise HTTPException(status_code=400, detail="Missing filename")
@@ -142,28 +293,50 @@ def upload_file(request: Request, file: UploadFile = File(...)) -> RedirectRespo
         raise HTTPException(status_code=400, detail="Invalid filename")
 
     try:
-        db.store_upload(file.file, original_name)
+        record = db.store_upload(file.file, original_name, defer_hash=True)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
+    # Hashing hundreds of MB on a Pi takes seconds; do it after the redirect goes out.
+    background_tasks.add_task(db.finalize_upload, record.id)
+
     return RedirectResponse(url="/files", status_code=303)
 
 
+class DownloadResponse(FileResponse):
+    """FileResponse with bigger reads; each chunk is a threadpool hop, and uvicorn has no pathsend."""
+
+    chunk_size = 1024 * 1024
+
+
 @app.get("/files/{file_id}/download")
-def download_file(file_id: int) -> FileResponse:
+def download_file(file_id: int, request: Request) -> Response:
     """Stream a stored file back to anyone with the link and zero shame."""
     record = db.get_file(file_id)
     if not record:
         raise HTTPException(status_code=404, detail="File not found")
 
     file_path = db.FILES_DIR / record.stored_name
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="File missing on disk")
-
-    return FileResponse(
+    # One stat serves the existence check and Content-Length; FileResponse skips its own.
+    try:
+        stat_result = os.stat(file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File missing on disk") from None
+
+    # Stored files never change, so the upload hash doubles as a free ETag.
+    headers = {}
+    if record.sha256 != db.HASH_PENDING:
+        etag = f'"{record.sha256}"'
+        headers = {"ETag": etag, "Cache-Control": "public, max-age=3600"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+    return DownloadResponse(
         file_path,
         media_type="application/octet-stream",
         filename=record.original_name,
+        headers=headers,
+        stat_result=stat_result,
     )
 
 
@@ -184,15 +357,25 @@ def chat_page(request: Request) -> HTMLResponse:
 
 
 @app.get("/api/chat/messages")
-def chat_messages(after_id: int = 0) -> JSONResponse:
-    """Return chat messages newer than the given id."""
-    messages = db.list_chat_messages(after_id=after_id, limit=200)
-    payload = [message.__dict__ for message in messages]
-    return JSONResponse({"messages": payload})
+async def chat_messages(after_id: int = 0, wait: float = 0) -> Response:
+    """Return chat messages newer than the given id, optionally long-polling for them."""
+    wait = min(max(wait, 0.0), CHAT_LONG_POLL_SECONDS)
+    arrived = chat_feed.current()
+    messages = await run_in_threadpool(db.list_chat_messages_raw, after_id=after_id, limit=200)
+    if not messages and wait:
+        try:
+            await asyncio.wait_for(arrived.wait(), timeout=wait)
+        except asyncio.TimeoutError:
+            pass
+        else:
+            messages = await run_in_threadpool(
+                db.list_chat_messages_raw, after_id=after_id, limit=200
+            )
+    return _json_response({"messages": messages})
 
 
 @app.post("/api/chat/messages")
-def post_chat_message(
+async def post_chat_message(
     nickname: Optional[str] = Form(None),
     message: Optional[str] = Form(None),
 ) -> JSONResponse:
@@ -206,7 +389,8 @@ def post_chat_message(
     if len(clean_message) > db.MAX_MESSAGE_LEN:
         raise HTTPException(status_code=400, detail="Message too long")
 
-    msg = db.insert_chat_message(clean_nick, clean_message)
+    msg = await chat_batcher.submit(clean_nick, clean_message)
+    chat_feed.notify()
     return JSONResponse({"message": msg.__dict__})
 
 
@@ -281,7 +465,7 @@ def reply_thread(
     return RedirectResponse(url=f"/forum/{thread_id}", status_code=303)
 
 
-CAPTIVE_PORTAL_PATHS = {
+CAPTIVE_PORTAL_PATHS = frozenset({
     "/generate_204",
     "/gen_204",
     "/hotspot-detect.html",
@@ -291,23 +475,43 @@ CAPTIVE_PORTAL_PATHS = {
     "/ncsi.txt",
     "/connecttest.txt",
     "/redirect",
+})
+
+# Probe answers never change, so build them once instead of per request.
+_RESP_NO_CONTENT = Response(status_code=204)
+_RESP_SUCCESS = PlainTextResponse("Success")
+_CAPTIVE_RESPONSES = {
+    "/generate_204": _RESP_NO_CONTENT,
+    "/gen_204": _RESP_NO_CONTENT,
+    "/hotspot-detect.html": HTMLResponse("<html><body>Success</body></html>"),
+    "/library/test/success.html": _RESP_SUCCESS,
+    "/success.html": _RESP_SUCCESS,
+    "/success.txt": _RESP_SUCCESS,
+    "/ncsi.txt": PlainTextResponse("Microsoft NCSI"),
+    "/connecttest.txt": PlainTextResponse("Microsoft Connect Test"),
+    "/redirect": RedirectResponse(url="/", status_code=302),
 }
 
+
+_RESP_ROBOTS = PlainTextResponse("User-agent: *\nDisallow:\n")
+_RESP_NOT_FOUND = PlainTextResponse("Not found", status_code=404)
+
+
 def _captive_success_response(path: str) -> Response:
     """Return OS-specific connectivity success responses to shut the portal up."""
-    if path in {"/generate_204", "/gen_204"}:
-        return Response(status_code=204)
-    if path == "/hotspot-detect.html":
-        return HTMLResponse("<html><body>Success</body></html>")
-    if path in {"/library/test/success.html", "/success.html", "/success.txt"}:
-        return PlainTextResponse("Success")
-    if path == "/ncsi.txt":
-        return PlainTextResponse("Microsoft NCSI")
-    if path == "/connecttest.txt":
-        return PlainTextResponse("Microsoft Connect Test")
-    if path == "/redirect":
-        return RedirectResponse(url="/", status_code=302)
-    return PlainTextResponse("Success")
+    return _CAPTIVE_RESPONSES.get(path, _RESP_SUCCESS)
+
+
+@app.get("/favicon.ico", response_model=None)
+def favicon() -> Response:
+    """Answer the favicon request every browser makes, without a 404 detour."""
+    return _RESP_NO_CONTENT
+
+
+@app.get("/robots.txt", response_class=PlainTextResponse, response_model=None)
+def robots() -> Response:
+    """Tell crawlers on the LAN they are welcome, for all the good it does them."""
+    return _RESP_ROBOTS
 
 
 @app.get("/{path:path}", response_class=PlainTextResponse, response_model=None)
@@ -318,7 +522,7 @@ def captive_fallback(path: str, request: Request) -> Response:
         if _captive_acknowledged(request):
             return _captive_success_response(full_path)
         return RedirectResponse(url="/captive", status_code=302)
-    return PlainTextResponse("Not found", status_code=404)
+    return _RESP_NOT_FOUND
 
 
 if __name__ == "__main__":
@@ -12,8 +12,13 @@
   const nicknameInput = document.getElementById("chat-nickname");
   const messageInput = document.getElementById("chat-message");
   const storageKey = "piratebox.nickname";
+  const longPollSeconds = 25;
+  const retryDelayMs = 2500;
 
+  // Only poll responses move lastId: a batch can give someone else's message a lower id than
+  // ours, and skipping past it would hide it. Own posts shown early are remembered here.
   let lastId = parseInt(chatList.dataset.lastId || "0", 10);
+  const shownIds = new Set();
 
   if (nicknameInput) {
     const stored = window.localStorage.getItem(storageKey);
@@ -68,25 +73,55 @@
   }
 
   /**
-   * Poll the server for new chat messages.
+   * Long-poll the server for new chat messages.
+   * The server holds the request open until something arrives or it times out.
+   * @returns {Promise<boolean>} false when the request failed
    */
   async function fetchMessages() {
     try {
-      const response = await fetch(`/api/chat/messages?after_id=${lastId}`);
+      const response = await fetch(`/api/chat/messages?after_id=${lastId}&wait=${longPollSeconds}`);
       if (!response.ok) {
-        return;
+        return false;
       }
       const payload = await response.json();
       if (!payload.messages || payload.messages.length === 0) {
-        return;
+        return true;
       }
+      let appended = false;
       payload.messages.forEach((msg) => {
-        appendMessage(msg);
         lastId = Math.max(lastId, msg.id);
+        // Our own posts may already be on screen by the time the poll returns.
+        if (shownIds.has(msg.id)) {
+          return;
+        }
+        appendMessage(msg);
+        appended = true;
       });
-      scrollToBottom();
+      // The next poll starts after lastId, so nothing at or below it can come back twice.
+      shownIds.forEach((id) => {
+        if (id <= lastId) {
+          shownIds.delete(id);
+        }
+      });
+      if (appended) {
+        scrollToBottom();
+      }
+      return true;
     } catch (err) {
       // network hiccups happen; the void does not care.
+      return false;
+    }
+  }
+
+  /**
+   * Keep a long poll in flight, backing off a little when the network sulks.
+   */
+  async function pollForever() {
+    for (;;) {
+      const ok = await fetchMessages();
+      if (!ok) {
+        await new Promise((resolve) => window.setTimeout(resolve, retryDelayMs));
+      }
     }
   }
 
@@ -123,9 +158,9 @@
         return;
       }
       const payload = await response.json();
-      if (payload.message) {
+      if (payload.message && payload.message.id > lastId && !shownIds.has(payload.message.id)) {
+        shownIds.add(payload.message.id);
         appendMessage(payload.message);
-        lastId = Math.max(lastId, payload.message.id);
         scrollToBottom();
       }
       messageInput.value = "";
@@ -134,8 +169,7 @@
     }
   }
 
-  fetchMessages();
-  window.setInterval(fetchMessages, 2500);
+  pollForever();
   if (chatForm) {
     chatForm.addEventListener("submit", sendMessage);
   }
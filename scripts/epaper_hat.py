@@ -4,18 +4,25 @@
 from __future__ import annotations
 
 import argparse
-import importlib
+import hashlib
 import os
 import socket
-import sqlite3
-import subprocess
 import sys
+import threading
 import time
+from collections import deque
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Callable, Optional
+from typing import TYPE_CHECKING, Callable, Optional
 
-from PIL import Image, ImageDraw, ImageFont
+if TYPE_CHECKING:
+    import sqlite3
+
+    from PIL import Image, ImageChops, ImageDraw, ImageFont
+else:
+    # Pillow is bound by _lazy_pil() once a driver loaded; --help should not pay for it.
+    Image = ImageChops = ImageDraw = ImageFont = None
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 DEFAULT_LOGO = ROOT_DIR / "app" / "static" / "images" / "PirateBoxLogo2.png"
@@ -23,7 +30,11 @@ DEFAULT_BUTTON_PINS = "5,6,13,19"
 FOOTER_HINTS = ("K1 STAT", "K2 NET", "K3 BOX", "K4 SLEEP")
 
 
-@dataclass
+# (x0, y0, x1, y1) with exclusive ends, in the coordinates of the image handed to draw().
+Box = tuple[int, int, int, int]
+
+
+@dataclass(slots=True)
 class DisplayDriver:
     """Thin wrapper for whatever EPD driver woke up today."""
     epd: object
@@ -32,7 +43,14 @@ class DisplayDriver:
     init: Callable[[], None]
     sleep: Callable[[], None]
     clear: Callable[[], None]
-    draw: Callable[[Image.Image, bool], None]
+    draw: Callable[[Image.Image, bool, Optional[Box]], None]
+
+
+def _lazy_pil() -> None:
+    """Import Pillow on first use and bind it to the module globals."""
+    global Image, ImageChops, ImageDraw, ImageFont
+    if Image is None:
+        from PIL import Image, ImageChops, ImageDraw, ImageFont
 
 
 def _debug(enabled: bool, message: str) -> None:
@@ -41,7 +59,21 @@ def _debug(enabled: bool, message: str) -> None:
         print(f"[epaper] {message}", file=sys.stderr, flush=True)
 
 
-def _load_driver(preferred: str, debug: bool = False) -> DisplayDriver:
+_WAVESHARE_CANDIDATES = ("waveshare_epd.epd2in7", "waveshare_epd.epd2in7_V2")
+# Modules whose display_Partial(buf, x0, y0, x1, y1) reads buf as the window's rows alone.
+# Other drivers taking a window disagree on that, so they get the whole frame and panel.
+_WINDOWED_PARTIAL_MODULES = frozenset({"epd2in7_V2"})
+
+
+def _import_module(name: str) -> object:
+    """Import a dotted module name, or hand back the copy that is already loaded."""
+    module = sys.modules.get(name)
+    if module is None:
+        module = __import__(name, fromlist=("EPD",))
+    return module
+
+
+def _load_driver(preferred: str, debug: bool = False, module_hint: str = "") -> DisplayDriver:
     """Load the requested EPD driver or die trying."""
     errors: list[str] = []
 
@@ -70,8 +102,8 @@ def _load_driver(preferred: str, debug: bool = False) -> DisplayDriver:
                 elif hasattr(epd, "clear_screen"):
                     epd.clear_screen()
 
-            def _draw(image: Image.Image, full: bool) -> None:
-                """Draw an image using whatever rpi_epd2in7 exposes."""
+            def _draw(image: Image.Image, full: bool, bbox: Optional[Box] = None) -> None:
+                """Draw an image using whatever rpi_epd2in7 exposes; smart_update finds its own diff."""
                 if full and hasattr(epd, "display_frame"):
                     epd.display_frame(image)
                 elif hasattr(epd, "smart_update"):
@@ -96,23 +128,22 @@ def _load_driver(preferred: str, debug: bool = False) -> DisplayDriver:
 
     def _try_waveshare_epd() -> Optional[DisplayDriver]:
         """Attempt to initialize Waveshare drivers with smart fallbacks."""
-        module_hint = os.getenv("PIRATEBOX_EPD_WAVESHARE_MODULE", "").strip()
         module_map = {
             "epd2in7": "epd2in7",
             "epd2in7_v2": "epd2in7_V2",
             "v2": "epd2in7_V2",
         }
         if module_hint:
-            module_name = module_map.get(module_hint.lower(), module_hint)
-            module_names = [module_name]
+            candidates: tuple[str, ...] = (f"waveshare_epd.{module_map.get(module_hint.lower(), module_hint)}",)
         else:
-            module_names = ["epd2in7", "epd2in7_V2"]
+            candidates = _WAVESHARE_CANDIDATES
 
+        module_names = [name.rpartition(".")[2] for name in candidates]
         _debug(debug, f"Trying driver: waveshare_epd ({', '.join(module_names)})")
 
-        for module_name in module_names:
+        for qualified, module_name in zip(candidates, module_names):
             try:
-                module = importlib.import_module(f"waveshare_epd.{module_name}")
+                module = _import_module(qualified)
             except Exception as exc:
                 _record(exc, f"waveshare_epd {module_name} import")
                 continue
@@ -136,8 +167,21 @@ def _load_driver(preferred: str, debug: bool = False) -> DisplayDriver:
                 partial_display = _pick_method(
                     ("display_partial", "display_Partial", "display_fast", "display_Fast", "displayPartial")
                 )
+                packing = _probe_packing(epd)
+                native_pack = (epd.width, epd.height) in packing
+                takes_window = partial_display is not None and _accepts_region(partial_display)
+                partial_region = takes_window and native_pack and module_name in _WINDOWED_PARTIAL_MODULES
+                _debug(
+                    debug,
+                    "Frame packing: "
+                    + (", ".join(f"{w}x{h}" for w, h in packing) + " via Pillow" if packing else "driver getbuffer"),
+                )
                 if partial_display:
-                    _debug(debug, f"Partial refresh supported via {partial_display.__name__}")
+                    _debug(
+                        debug,
+                        f"Partial refresh supported via {partial_display.__name__}"
+                        f"{' (windowed)' if partial_region else ''}",
+                    )
                 else:
                     _debug(debug, "Partial refresh not supported; using full refresh only")
 
@@ -145,16 +189,34 @@ def _load_driver(preferred: str, debug: bool = False) -> DisplayDriver:
                     """Clear the Waveshare display to white."""
                     epd.Clear(0xFF)
 
-                def _draw(image: Image.Image, full: bool) -> None:
+                def _pack(image: Image.Image) -> object:
+                    """Pack a frame for the panel, letting Pillow do it in C when the layouts match."""
+                    if image.mode == "1" and image.size in packing:
+                        method = packing[image.size]
+                        return (image if method is None else image.transpose(method)).tobytes()
+                    return epd.getbuffer(image)
+
+                def _draw(image: Image.Image, full: bool, bbox: Optional[Box] = None) -> None:
                     """Draw using full or partial refresh when available."""
                     nonlocal partial_ready
-                    buffer = epd.getbuffer(image)
                     if not full and partial_display:
                         if partial_init and not partial_ready:
                             partial_init()
                             partial_ready = True
-                        partial_display(buffer)
+                        if bbox and partial_region and image.size == (epd.width, epd.height):
+                            # Windowed update: ship only the dirty rows, byte-aligned on x.
+                            x0 = bbox[0] // 8 * 8
+                            x1 = min(epd.width, -(-bbox[2] // 8) * 8)
+                            region = image.crop((x0, bbox[1], x1, bbox[3]))
+                            partial_display(region.tobytes(), x0, bbox[1], x1, bbox[3])
+                            return
+                        if takes_window:
+                            # A full-panel window reads the same under either buffer layout.
+                            partial_display(_pack(image), 0, 0, epd.width, epd.height)
+                            return
+                        partial_display(_pack(image))
                         return
+                    buffer = _pack(image)
                     if full and partial_ready:
                         epd.init()
                         partial_ready = False
@@ -233,17 +295,72 @@ def _load_driver(preferred: str, debug: bool = False) -> DisplayDriver:
     _fail()
 
 
-@dataclass
+@dataclass(slots=True)
 class ButtonConfig:
     pins: list[int]
     pull_up: bool
 
 
-def _parse_buttons(raw: str) -> ButtonConfig:
-    """Parse button pin list and pull-up config from env or args."""
+def _probe_pattern(width: int, height: int) -> Image.Image:
+    """Build a 1-bit test frame that is asymmetric on both axes, so no flip or turn matches by accident."""
+    row = (width + 7) // 8
+    pattern = bytes((i * 37 + i // row) & 0xFF for i in range(row * height))
+    return Image.frombytes("1", (width, height), pattern)
+
+
+def _probe_packing(epd: object) -> dict[tuple[int, int], Optional[int]]:
+    """Map frame sizes whose getbuffer() Pillow can reproduce to the transpose it needs (None: as is)."""
+    _lazy_pil()
+    width = int(getattr(epd, "width", 0))
+    height = int(getattr(epd, "height", 0))
+    packing: dict[tuple[int, int], Optional[int]] = {}
+    if width <= 0 or height <= 0 or width % 8:
+        return packing
+
+    native = _probe_pattern(width, height)
+    try:
+        if bytes(epd.getbuffer(native)) == native.tobytes():
+            packing[(width, height)] = None
+    except Exception:
+        return packing
+    if (width, height) not in packing or width == height:
+        return packing
+
+    # Rotated frames: the driver turns them back to native before packing; find out which way.
+    landscape = _probe_pattern(height, width)
+    try:
+        packed = bytes(epd.getbuffer(landscape))
+    except Exception:
+        return packing
+    for method in (
+        Image.Transpose.ROTATE_90,
+        Image.Transpose.ROTATE_270,
+        Image.Transpose.TRANSPOSE,
+        Image.Transpose.TRANSVERSE,
+    ):
+        if landscape.transpose(method).tobytes() == packed:
+            packing[(height, width)] = method
+            break
+    return packing
+
+
+def _accepts_region(method: Callable[..., None]) -> bool:
+    """Tell whether a partial display method takes a window (buffer, x0, y0, x1, y1)."""
+    import inspect
+
+    try:
+        params = inspect.signature(method).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    positional = [p for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+    return len(positional) >= 5
+
+
+def _parse_buttons(raw: str, pull_up: bool = True) -> ButtonConfig:
+    """Parse the button pin list from env or args."""
     raw = raw.strip()
     if not raw or raw.lower() in {"none", "off", "0", "false"}:
-        return ButtonConfig(pins=[], pull_up=os.getenv("PIRATEBOX_EPD_BUTTON_PULL_UP", "1") != "0")
+        return ButtonConfig(pins=[], pull_up=pull_up)
 
     pins: list[int] = []
     for chunk in raw.split(","):
@@ -251,32 +368,49 @@ def _parse_buttons(raw: str) -> ButtonConfig:
         if not chunk:
             continue
         pins.append(int(chunk))
-    pull_up = os.getenv("PIRATEBOX_EPD_BUTTON_PULL_UP", "1") != "0"
     return ButtonConfig(pins=pins, pull_up=pull_up)
 
 
-@dataclass
+@dataclass(slots=True)
 class State:
-    """Track the current page and sleep state for the display."""
+    """Track the current page, sleep state, and what is on the panel right now."""
     page: int = 0
     sleeping: bool = False
     force_refresh: bool = False
+    last_digest: Optional[bytes] = None
+    last_full_digest: Optional[bytes] = None
+    last_image: Optional[Image.Image] = None
+    # Page last_image was rendered for; its stamp box only fits that page.
+    last_page: Optional[int] = None
+    last_canvas: Optional[Image.Image] = None
+    last_timestamp: str = ""
+
+    def forget_frame(self) -> None:
+        """Drop the last frame and its digests so the next frame is drawn no matter what."""
+        self.last_digest = None
+        self.last_full_digest = None
+        self.last_image = None
+        self.last_page = None
+        self.last_canvas = None
 
     def set_page(self, page: int, total: int) -> None:
         """Set the page within bounds and force a refresh."""
         if 0 <= page < total:
             self.page = page
         self.force_refresh = True
+        self.forget_frame()
 
     def next_page(self, total: int) -> None:
         """Advance to the next page, wrapping around."""
         self.page = (self.page + 1) % total
         self.force_refresh = True
+        self.forget_frame()
 
     def prev_page(self, total: int) -> None:
         """Go back one page, wrapping around."""
         self.page = (self.page - 1) % total
         self.force_refresh = True
+        self.forget_frame()
 
     def toggle_sleep(self, driver: DisplayDriver) -> None:
         """Toggle sleep state and reset the display if waking up."""
@@ -287,9 +421,10 @@ class State:
             driver.sleep()
             self.sleeping = True
         self.force_refresh = True
+        self.forget_frame()
 
 
-@dataclass
+@dataclass(slots=True)
 class ButtonHandler:
     """Map button presses to state transitions."""
     state: State
@@ -313,6 +448,10 @@ class ButtonHandler:
         self.state.toggle_sleep(self.driver)
 
 
+# How often pins are sampled when the GPIO library cannot do edge detection.
+BUTTON_POLL_SECONDS = 0.05
+
+
 class ButtonWatcher:
     """Watch GPIO buttons and invoke handlers with minimal drama."""
     def __init__(self, config: ButtonConfig, handler: ButtonHandler):
@@ -320,11 +459,22 @@ class ButtonWatcher:
         self.handler = handler
         self._gpio = None
         self._buttons = []
+        self._wake = threading.Event()
+        # Presses land here from GPIO threads; handlers touch SPI, so only the main loop runs them.
+        self._pending: deque[Callable[[], None]] = deque()
+        self._polled: list[tuple[int, Callable[[], None]]] = []
         self._last_states: list[int] = []
 
         if not config.pins:
             return
 
+        callbacks = [
+            self._wrap(handler.on_status),
+            self._wrap(handler.on_network),
+            self._wrap(handler.on_piratebox),
+            self._wrap(handler.on_sleep),
+        ]
+
         try:
             from gpiozero import Button  # type: ignore
 
@@ -332,12 +482,6 @@ class ButtonWatcher:
                 btn = Button(pin, pull_up=config.pull_up, bounce_time=0.05)
                 self._buttons.append(btn)
 
-            callbacks = [
-                handler.on_status,
-                handler.on_network,
-                handler.on_piratebox,
-                handler.on_sleep,
-            ]
             for btn, cb in zip(self._buttons, callbacks):
                 btn.when_pressed = cb
             return
@@ -349,40 +493,70 @@ class ButtonWatcher:
 
             self._gpio = GPIO
             GPIO.setmode(GPIO.BCM)
-            for pin in config.pins:
+            for pin, cb in zip(config.pins, callbacks):
                 GPIO.setup(
                     pin,
                     GPIO.IN,
                     pull_up_down=GPIO.PUD_UP if config.pull_up else GPIO.PUD_DOWN,
                 )
-            self._last_states = [GPIO.input(pin) for pin in config.pins]
+                # Let the kernel interrupt us on the edge; poll only if the backend refuses.
+                try:
+                    GPIO.add_event_detect(pin, GPIO.FALLING, callback=lambda _pin, cb=cb: cb(), bouncetime=50)
+                except Exception:
+                    self._polled.append((pin, cb))
+            self._last_states = [GPIO.input(pin) for pin, _ in self._polled]
         except Exception:
             self._gpio = None
-
-    def poll(self) -> None:
-        """Poll buttons when using the RPi.GPIO fallback."""
-        if not self._gpio:
-            return
-
-        callbacks = [
-            self.handler.on_status,
-            self.handler.on_network,
-            self.handler.on_piratebox,
-            self.handler.on_sleep,
-        ]
-        for idx, pin in enumerate(self.config.pins):
+            self._polled = []
+
+    def _wrap(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Queue a handler for the main loop and wake it so the press shows up right away."""
+        def _fire() -> None:
+            self._pending.append(callback)
+            self._wake.set()
+
+        return _fire
+
+    def dispatch(self) -> bool:
+        """Run queued handlers on the calling thread, between draws; True if any ran."""
+        ran = False
+        while self._pending:
+            self._pending.popleft()()
+            ran = True
+        return ran
+
+    def _poll(self) -> None:
+        """Sample the pins that could not get edge detection."""
+        for idx, (pin, callback) in enumerate(self._polled):
             current = self._gpio.input(pin)
             if self._last_states[idx] == 1 and current == 0:
-                callbacks[idx]()
+                callback()
             self._last_states[idx] = current
 
+    def wait(self, timeout: Optional[float]) -> bool:
+        """Sleep up to timeout seconds (None: until a press), returning early (True) when a button fired."""
+        if self._polled:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._wake.is_set():
+                remaining = BUTTON_POLL_SECONDS if deadline is None else deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._wake.wait(min(remaining, BUTTON_POLL_SECONDS))
+                self._poll()
+        else:
+            self._wake.wait(timeout)
+        woke = self._wake.is_set()
+        self._wake.clear()
+        self.dispatch()
+        return woke
+
     def close(self) -> None:
         """Release GPIO resources when exiting."""
         if self._gpio:
             self._gpio.cleanup()
 
 
-@dataclass
+@dataclass(slots=True)
 class Stats:
     """Snapshot of system and PirateBox stats at a point in time."""
     cpu_usage: float
@@ -391,6 +565,8 @@ class Stats:
     mem_total: int
     disk_used: int
     disk_total: int
+    mem_percent: float
+    disk_percent: float
     uptime: str
     ip: str
     files: int
@@ -399,7 +575,7 @@ class Stats:
     timestamp: str
 
 
-@dataclass
+@dataclass(slots=True)
 class RefreshPolicy:
     """Refresh thresholds to avoid ghosting and needless redraws."""
     on_change: bool
@@ -446,6 +622,41 @@ def _parse_refresh_policy() -> RefreshPolicy:
     )
 
 
+@dataclass(frozen=True, slots=True)
+class EpdConfig:
+    """Every PIRATEBOX_EPD_* knob (plus the shared paths), read once at startup."""
+    interval: int
+    rotate: int
+    logo: str
+    buttons: str
+    button_pull_up: bool
+    driver: str
+    waveshare_module: str
+    font: str
+    full_refresh_every: int
+    refresh: RefreshPolicy
+    db_path: Path
+    data_path: Path
+
+    @classmethod
+    def from_env(cls) -> "EpdConfig":
+        """Read the environment in one pass; CLI flags override the first few later."""
+        return cls(
+            interval=_read_env_int("PIRATEBOX_EPD_INTERVAL", 30),
+            rotate=_read_env_int("PIRATEBOX_EPD_ROTATE", 0),
+            logo=os.getenv("PIRATEBOX_EPD_LOGO", str(DEFAULT_LOGO)),
+            buttons=os.getenv("PIRATEBOX_EPD_BUTTON_PINS", DEFAULT_BUTTON_PINS),
+            button_pull_up=os.getenv("PIRATEBOX_EPD_BUTTON_PULL_UP", "1") != "0",
+            driver=os.getenv("PIRATEBOX_EPD_DRIVER", "auto"),
+            waveshare_module=os.getenv("PIRATEBOX_EPD_WAVESHARE_MODULE", "").strip(),
+            font=os.getenv("PIRATEBOX_EPD_FONT", "").strip(),
+            full_refresh_every=max(0, _read_env_int("PIRATEBOX_EPD_FULL_REFRESH_EVERY", 10)),
+            refresh=_parse_refresh_policy(),
+            db_path=Path(os.getenv("PIRATEBOX_DB_PATH", ROOT_DIR / "data" / "piratebox.db")),
+            data_path=Path(os.getenv("PIRATEBOX_DATA_DIR", ROOT_DIR / "data")),
+        )
+
+
 def _percent(value: int, total: int) -> float:
     """Return a percent value while pretending division is harmless."""
     if total <= 0:
@@ -466,69 +677,153 @@ def _stats_changed(prev: Optional[Stats], curr: Stats, policy: RefreshPolicy) ->
         return True
     if _delta_exceeds(curr.cpu_usage - prev.cpu_usage, policy.cpu_delta):
         return True
-    if curr.cpu_temp is None or prev.cpu_temp is None:
-        if curr.cpu_temp != prev.cpu_temp:
+    curr_temp = curr.cpu_temp
+    prev_temp = prev.cpu_temp
+    if curr_temp is None or prev_temp is None:
+        if curr_temp != prev_temp:
             return True
-    elif _delta_exceeds(curr.cpu_temp - prev.cpu_temp, policy.temp_delta):
+    elif _delta_exceeds(curr_temp - prev_temp, policy.temp_delta):
         return True
-    mem_delta = _percent(curr.mem_used, curr.mem_total) - _percent(prev.mem_used, prev.mem_total)
-    if _delta_exceeds(mem_delta, policy.mem_delta):
+    if _delta_exceeds(curr.mem_percent - prev.mem_percent, policy.mem_delta):
         return True
-    disk_delta = _percent(curr.disk_used, curr.disk_total) - _percent(prev.disk_used, prev.disk_total)
-    if _delta_exceeds(disk_delta, policy.disk_delta):
+    if _delta_exceeds(curr.disk_percent - prev.disk_percent, policy.disk_delta):
         return True
-    if policy.count_delta > 0:
-        if abs(curr.files - prev.files) >= policy.count_delta:
+    count_delta = policy.count_delta
+    if count_delta > 0:
+        if abs(curr.files - prev.files) >= count_delta:
             return True
-        if abs(curr.threads - prev.threads) >= policy.count_delta:
+        if abs(curr.threads - prev.threads) >= count_delta:
             return True
-        if abs(curr.posts - prev.posts) >= policy.count_delta:
+        if abs(curr.posts - prev.posts) >= count_delta:
             return True
     if policy.ip_change and curr.ip != prev.ip:
         return True
     return False
 
 
-def _read_cpu_usage(prev: Optional[tuple[int, int]]) -> tuple[float, tuple[int, int]]:
-    """Compute CPU usage from /proc/stat deltas."""
-    with open("/proc/stat", "r", encoding="utf-8") as handle:
-        parts = handle.readline().split()[1:]
-    values = [int(v) for v in parts]
-    idle = values[3] + values[4]
-    total = sum(values)
-
-    if prev is None:
-        return 0.0, (total, idle)
+_PROC_FDS: dict[str, int] = {}
+
+
+def _read_proc(path: str, size: int) -> bytes:
+    """Read the head of a /proc file in one syscall, skipping the text IO stack."""
+    fd = _PROC_FDS.get(path)
+    if fd is None:
+        fd = os.open(path, os.O_RDONLY)
+        # The CPU sampler thread reads too; if it won the race, use its fd.
+        winner = _PROC_FDS.setdefault(path, fd)
+        if winner != fd:
+            os.close(fd)
+            fd = winner
+    # A read at offset 0 makes the kernel regenerate the file; pread skips the lseek.
+    return os.pread(fd, size, 0)
+
+
+def _close_proc() -> None:
+    """Close the cached /proc and /sys descriptors."""
+    while _PROC_FDS:
+        _, fd = _PROC_FDS.popitem()
+        os.close(fd)
+
+
+def _read_cpu_times() -> tuple[int, int]:
+    """Return the (total, idle) jiffies from the first line of /proc/stat."""
+    line = _read_proc("/proc/stat", 256).split(b"\n", 1)[0]
+    values = list(map(int, line.split()[1:]))
+    return sum(values), values[3] + values[4]
+
+
+def _cpu_percent(prev: tuple[int, int], curr: tuple[int, int]) -> float:
+    """Compute CPU usage between two /proc/stat samples."""
+    delta_total = curr[0] - prev[0]
+    delta_idle = curr[1] - prev[1]
+    return 0.0 if delta_total == 0 else (1.0 - delta_idle / delta_total) * 100
+
+
+class CpuSampler:
+    """Sample /proc/stat every second, so usage means "lately", not "since the last refresh"."""
+    def __init__(self, period: float = 1.0):
+        self.period = period
+        self._samples: deque[tuple[int, int]] = deque(maxlen=5)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._active = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Take a first sample and start the sampling thread."""
+        self._sample()
+        self._active.set()
+        self._thread = threading.Thread(target=self._run, name="epaper-cpu", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling; the thread is a daemon, so this is mostly good manners."""
+        self._stop.set()
+        self._active.set()
+        if self._thread:
+            self._thread.join(timeout=self.period * 2)
+
+    def pause(self) -> None:
+        """Park the thread until resume(); nobody reads CPU usage off a sleeping panel."""
+        self._active.clear()
+
+    def resume(self) -> None:
+        """Start over from a fresh sample, so usage does not average across the nap."""
+        with self._lock:
+            self._samples.clear()
+        self._sample()
+        self._active.set()
+
+    def _sample(self) -> None:
+        """Append one reading to the rolling window."""
+        sample = _read_cpu_times()
+        with self._lock:
+            self._samples.append(sample)
+
+    def _run(self) -> None:
+        """Sample until stopped, blocking outright while paused."""
+        while self._active.wait() and not self._stop.wait(self.period):
+            if not self._active.is_set():
+                continue
+            try:
+                self._sample()
+            except OSError:
+                continue
 
-    prev_total, prev_idle = prev
-    delta_total = total - prev_total
-    delta_idle = idle - prev_idle
-    usage = 0.0 if delta_total == 0 else (1.0 - delta_idle / delta_total) * 100
-    return usage, (total, idle)
+    def usage(self) -> float:
+        """Return CPU usage over the newest sampling period."""
+        with self._lock:
+            if len(self._samples) >= 2:
+                return _cpu_percent(self._samples[-2], self._samples[-1])
+            prev = self._samples[-1] if self._samples else None
+        # Less than a period since start(): measure against the first sample instead.
+        return 0.0 if prev is None else _cpu_percent(prev, _read_cpu_times())
 
 
 def _read_cpu_temp() -> Optional[float]:
     """Read CPU temperature if the kernel exposes it."""
-    path = Path("/sys/class/thermal/thermal_zone0/temp")
-    if not path.exists():
-        return None
-    raw = path.read_text().strip()
     try:
+        raw = _read_proc("/sys/class/thermal/thermal_zone0/temp", 32)
         return float(raw) / 1000.0
-    except ValueError:
+    except (OSError, ValueError):
         return None
 
 
+def _meminfo_kb(buf: bytes, key: bytes) -> int:
+    """Pull one "Key:   1234 kB" value out of a /proc/meminfo buffer."""
+    start = buf.find(key)
+    if start < 0:
+        return 0
+    start += len(key)
+    return int(buf[start:buf.index(b"kB", start)])
+
+
 def _read_mem() -> tuple[int, int]:
     """Return used and total memory in bytes."""
-    total = 0
-    available = 0
-    with open("/proc/meminfo", "r", encoding="utf-8") as handle:
-        for line in handle:
-            if line.startswith("MemTotal"):
-                total = int(line.split()[1]) * 1024
-            elif line.startswith("MemAvailable"):
-                available = int(line.split()[1]) * 1024
+    # MemTotal and MemAvailable are the first and third lines; no need to read the rest.
+    buf = _read_proc("/proc/meminfo", 512)
+    total = _meminfo_kb(buf, b"MemTotal:") * 1024
+    available = _meminfo_kb(buf, b"MemAvailable:") * 1024
     used = max(total - available, 0)
     return used, total
 
@@ -541,11 +836,21 @@ def _read_disk(path: Path) -> tuple[int, int]:
     return used, total
 
 
+_UPTIME_OFFSET: Optional[float] = None
+
+
 def _read_uptime() -> str:
     """Return uptime formatted for small screens."""
-    with open("/proc/uptime", "r", encoding="utf-8") as handle:
-        seconds = float(handle.read().split()[0])
-    minutes, _ = divmod(int(seconds), 60)
+    global _UPTIME_OFFSET
+    # Read /proc/uptime once; afterwards the monotonic clock ticks along with it.
+    if _UPTIME_OFFSET is None:
+        _UPTIME_OFFSET = float(_read_proc("/proc/uptime", 64).split()[0]) - time.monotonic()
+    return _format_uptime(int(time.monotonic() + _UPTIME_OFFSET) // 60)
+
+
+@lru_cache(maxsize=1)
+def _format_uptime(minutes: int) -> str:
+    """Format whole minutes of uptime; cached until the minute rolls over."""
     hours, minutes = divmod(minutes, 60)
     days, hours = divmod(hours, 24)
     if days:
@@ -555,9 +860,36 @@ def _read_uptime() -> str:
     return f"{minutes}m"
 
 
+IP_CACHE_TTL = _read_env_int("PIRATEBOX_EPD_IP_TTL", 30)
+_IP_CACHE: dict[str, object] = {"value": None, "ts": 0.0}
+
+
 def _read_ip() -> str:
+    """Return the local IP, re-resolving at most once per PIRATEBOX_EPD_IP_TTL seconds."""
+    now = time.monotonic()
+    cached = _IP_CACHE["value"]
+    if cached and cached != "unknown" and now - float(_IP_CACHE["ts"]) < IP_CACHE_TTL:
+        return str(cached)
+    value = _resolve_ip()
+    _IP_CACHE["value"] = value
+    _IP_CACHE["ts"] = now
+    return value
+
+
+def _resolve_ip() -> str:
     """Attempt to find a local IP without committing to the truth."""
+    # A UDP connect sends nothing; it just asks the kernel which source address it would use.
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+            probe.connect(("10.255.255.255", 1))
+            address = probe.getsockname()[0]
+        if address and address != "0.0.0.0":
+            return address
+    except OSError:
+        pass
     try:
+        import subprocess
+
         result = subprocess.check_output(["hostname", "-I"], text=True).strip()
         if result:
             return result.split()[0]
@@ -569,29 +901,135 @@ def _read_ip() -> str:
         return "unknown"
 
 
+# From <linux/rtnetlink.h>: multicast group for IPv4 address add/remove.
+RTMGRP_IPV4_IFADDR = 0x10
+
+
+class AddressWatcher:
+    """Drop the cached IP the moment the kernel reports an address change, instead of waiting out the TTL."""
+    def __init__(self, poll: float = 1.0):
+        self.poll = poll
+        self._sock: Optional[socket.socket] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """Subscribe to rtnetlink address events; False where there is no netlink."""
+        if not hasattr(socket, "AF_NETLINK"):
+            return False
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            sock.bind((0, RTMGRP_IPV4_IFADDR))
+        except OSError:
+            return False
+        # recv() does not notice close() from another thread; a timeout lets stop() land.
+        sock.settimeout(self.poll)
+        self._sock = sock
+        self._thread = threading.Thread(target=self._run, name="epaper-netlink", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """Stop listening and close the socket."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll * 2)
+        if self._sock:
+            self._sock.close()
+
+    def _run(self) -> None:
+        """Invalidate the IP cache on every address event until stopped."""
+        while not self._stop.is_set():
+            try:
+                self._sock.recv(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            # The payload does not matter; the next _read_ip() re-resolves. Not 0.0: the
+            # monotonic clock starts near zero at boot, right when DHCP hands out addresses.
+            _IP_CACHE["ts"] = float("-inf")
+
+
+# The app only ever appends to these tables (AUTOINCREMENT, no deletes), so the
+# highest rowid is the row count and costs one b-tree descent instead of a scan.
+_COUNTS_SQL = (
+    "SELECT (SELECT COALESCE(MAX(rowid), 0) FROM files),"
+    " (SELECT COALESCE(MAX(rowid), 0) FROM forum_threads),"
+    " (SELECT COALESCE(MAX(rowid), 0) FROM forum_posts)"
+)
+# Memory-map only on 64-bit; a 32-bit Pi Zero has no address space to spare.
+_DB_PRAGMAS = f"""
+PRAGMA query_only=1;
+PRAGMA mmap_size={67108864 if sys.maxsize > 2**32 else 0};
+PRAGMA temp_store=MEMORY;
+"""
+_DB_CONN: Optional[sqlite3.Connection] = None
+# Inode of the file _DB_CONN has open; a recreated DB gets a new one.
+_DB_INODE = 0
+
+
+def _get_db(db_path: Path, inode: int) -> sqlite3.Connection:
+    """Return the shared read-only connection, reopening it if the DB file was replaced."""
+    global _DB_CONN, _DB_INODE
+    import sqlite3
+
+    if _DB_CONN is not None and _DB_INODE != inode:
+        _close_db()
+    if _DB_CONN is None:
+        conn = sqlite3.connect(
+            f"{db_path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=16,
+        )
+        conn.executescript(_DB_PRAGMAS)
+        _DB_CONN = conn
+        _DB_INODE = inode
+    return _DB_CONN
+
+
+def _close_db() -> None:
+    """Drop the shared connection so the next call reopens it."""
+    global _DB_CONN
+    if _DB_CONN is not None:
+        try:
+            _DB_CONN.close()
+        except Exception:
+            pass
+        _DB_CONN = None
+
+
 def _read_counts(db_path: Path) -> tuple[int, int, int]:
-    """Count files, threads, and posts in the SQLite DB."""
-    if not db_path.exists():
+    """Count files, threads, and posts in the SQLite DB in one round-trip."""
+    import sqlite3
+
+    try:
+        inode = db_path.stat().st_ino
+    except OSError:
         return 0, 0, 0
     try:
-        with sqlite3.connect(db_path) as conn:
-            files = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
-            threads = conn.execute("SELECT COUNT(*) FROM forum_threads").fetchone()[0]
-            posts = conn.execute("SELECT COUNT(*) FROM forum_posts").fetchone()[0]
+        files, threads, posts = _get_db(db_path, inode).execute(_COUNTS_SQL).fetchone()
         return int(files), int(threads), int(posts)
+    except sqlite3.DatabaseError:
+        _close_db()
+        return 0, 0, 0
     except sqlite3.Error:
         return 0, 0, 0
 
 
+BYTE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+
+
+@lru_cache(maxsize=64)
 def _format_bytes(value: int) -> str:
     """Format byte counts without crying about base-2 vs base-10."""
-    step = 1024.0
-    size = float(value)
-    for unit in ["B", "KB", "MB", "GB", "TB"]:
-        if size < step:
-            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
-        size /= step
-    return f"{size:.1f}PB"
+    if value < 1024:
+        return f"{value}B"
+    # bit_length picks the 1024-power directly: one division, no loop.
+    shift = min((value.bit_length() - 1) // 10, len(BYTE_UNITS) - 1)
+    return f"{value / (1 << (shift * 10)):.1f}{BYTE_UNITS[shift]}"
 
 
 def _load_logo(path: Path, max_size: tuple[int, int]) -> Optional[Image.Image]:
@@ -606,22 +1044,49 @@ def _load_logo(path: Path, max_size: tuple[int, int]) -> Optional[Image.Image]:
     return logo.convert("1")
 
 
+def _rotate(image: Image.Image, angle: int) -> Image.Image:
+    """Rotate a frame counter-clockwise; right angles are a lossless pixel shuffle, not a resample."""
+    turns = angle % 360
+    if turns == 0:
+        return image
+    if turns % 90 == 0:
+        return image.transpose(
+            {90: Image.Transpose.ROTATE_90, 180: Image.Transpose.ROTATE_180, 270: Image.Transpose.ROTATE_270}[turns]
+        )
+    return image.rotate(angle, expand=True)
+
+
 def _prepare_canvas(width: int, height: int) -> Image.Image:
     """Create a blank 1-bit canvas."""
     return Image.new("1", (width, height), 255)
 
 
-@dataclass
+class FrameBuffers:
+    """Two canvases, allocated once; frames are drawn into whichever one the panel is not showing."""
+    def __init__(self, width: int, height: int):
+        self._frames = (_prepare_canvas(width, height), _prepare_canvas(width, height))
+
+    def back(self, shown: Optional[Image.Image]) -> Image.Image:
+        """Return the buffer that is safe to overwrite while `shown` stays intact."""
+        return self._frames[1] if shown is self._frames[0] else self._frames[0]
+
+
+@dataclass(slots=True)
 class Fonts:
-    """Bundle fonts for reuse across rendering functions."""
+    """Bundle fonts and their line heights, measured once instead of every frame."""
     tiny: ImageFont.ImageFont
     small: ImageFont.ImageFont
     medium: ImageFont.ImageFont
     large: ImageFont.ImageFont
     huge: ImageFont.ImageFont
+    tiny_h: int
+    small_h: int
+    medium_h: int
+    large_h: int
+    huge_h: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Layout:
     """Layout metrics for header, footer, and margins."""
     margin: int
@@ -639,8 +1104,21 @@ def _font_height(font: ImageFont.ImageFont) -> int:
         return font.getsize("Ag")[1]
 
 
+# Fonts measured by _text_width, keyed by id(); holding them here keeps the ids unique.
+_KNOWN_FONTS: dict[int, ImageFont.ImageFont] = {}
+
+
 def _text_width(font: ImageFont.ImageFont, text: str) -> int:
+    """Measure text width, asking FreeType only for strings it has not seen yet."""
+    font_id = id(font)
+    _KNOWN_FONTS.setdefault(font_id, font)
+    return _text_width_cached(font_id, text)
+
+
+@lru_cache(maxsize=256)
+def _text_width_cached(font_id: int, text: str) -> int:
     """Measure text width with a fallback for older PIL."""
+    font = _KNOWN_FONTS[font_id]
     try:
         bbox = font.getbbox(text)
         return max(1, int(bbox[2] - bbox[0]))
@@ -648,7 +1126,39 @@ def _text_width(font: ImageFont.ImageFont, text: str) -> int:
         return font.getsize(text)[0]
 
 
-def _load_fonts(width: int, height: int) -> Fonts:
+TextTile = tuple["Image.Image", int, int]
+
+
+def _paste_text(image: Image.Image, xy: tuple[int, int], text: str, font: ImageFont.ImageFont, fill: int) -> None:
+    """Draw text by stamping a cached glyph mask; FreeType only sees each string once."""
+    font_id = id(font)
+    _KNOWN_FONTS.setdefault(font_id, font)
+    tile = _text_tile_cached(font_id, text)
+    if tile is None:
+        ImageDraw.Draw(image).text(xy, text, font=font, fill=fill)
+        return
+    mask, dx, dy = tile
+    image.paste(fill, (xy[0] + dx, xy[1] + dy), mask)
+
+
+@lru_cache(maxsize=256)
+def _text_tile_cached(font_id: int, text: str) -> Optional[TextTile]:
+    """Rasterize text into a 1-bit mask cropped to its ink, plus the offset of that crop."""
+    font = _KNOWN_FONTS[font_id]
+    try:
+        left, top, right, bottom = (int(v) for v in font.getbbox(text, mode="1"))
+    except Exception:
+        return None
+    if right <= left or bottom <= top:
+        return None
+    # A spare pixel of slack per side; hinting and bbox rounding do not always agree.
+    left, top, right, bottom = left - 1, top - 1, right + 1, bottom + 1
+    mask = Image.new("1", (right - left, bottom - top), 0)
+    ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255)
+    return mask, left, top
+
+
+def _load_fonts(width: int, height: int, font_hint: str = "") -> Fonts:
     """Load fonts with reasonable fallbacks and size scaling."""
     base = max(1.0, min(width, height) / 176.0)
     sizes = {
@@ -658,7 +1168,6 @@ def _load_fonts(width: int, height: int) -> Fonts:
         "large": max(16, int(20 * base)),
         "huge": max(20, int(26 * base)),
     }
-    font_hint = os.getenv("PIRATEBOX_EPD_FONT", "").strip()
     candidates = [
         font_hint,
         "DejaVuSans.ttf",
@@ -677,12 +1186,22 @@ def _load_fonts(width: int, height: int) -> Fonts:
                 continue
         return ImageFont.load_default()
 
+    tiny = _try_font(sizes["tiny"])
+    small = _try_font(sizes["small"])
+    medium = _try_font(sizes["medium"])
+    large = _try_font(sizes["large"])
+    huge = _try_font(sizes["huge"])
     return Fonts(
-        tiny=_try_font(sizes["tiny"]),
-        small=_try_font(sizes["small"]),
-        medium=_try_font(sizes["medium"]),
-        large=_try_font(sizes["large"]),
-        huge=_try_font(sizes["huge"]),
+        tiny=tiny,
+        small=small,
+        medium=medium,
+        large=large,
+        huge=huge,
+        tiny_h=_font_height(tiny),
+        small_h=_font_height(small),
+        medium_h=_font_height(medium),
+        large_h=_font_height(large),
+        huge_h=_font_height(huge),
     )
 
 
@@ -691,8 +1210,8 @@ def _make_layout(fonts: Fonts, width: int, height: int) -> Layout:
     base = max(1.0, min(width, height) / 176.0)
     margin = max(4, int(6 * base))
     gutter = max(3, int(4 * base))
-    header_h = _font_height(fonts.medium) + gutter * 2
-    footer_h = _font_height(fonts.tiny) + gutter * 2
+    header_h = fonts.medium_h + gutter * 2
+    footer_h = fonts.tiny_h + gutter * 2
     return Layout(margin=margin, gutter=gutter, header_h=header_h, footer_h=footer_h)
 
 
@@ -700,18 +1219,27 @@ def _draw_header(
     draw: ImageDraw.ImageDraw,
     width: int,
     title: str,
-    timestamp: str,
     fonts: Fonts,
     layout: Layout,
 ) -> None:
-    """Draw the header bar with title and timestamp."""
+    """Draw the header bar with its page title."""
     draw.rectangle((0, 0, width, layout.header_h), fill=0)
-    title_y = (layout.header_h - _font_height(fonts.medium)) // 2
+    title_y = (layout.header_h - fonts.medium_h) // 2
     draw.text((layout.margin, title_y), title, font=fonts.medium, fill=255)
+
+
+def _draw_timestamp(
+    image: Image.Image,
+    width: int,
+    timestamp: str,
+    fonts: Fonts,
+    layout: Layout,
+) -> None:
+    """Draw the timestamp on the right side of an existing header bar."""
     if timestamp:
         stamp_w = _text_width(fonts.small, timestamp)
-        stamp_y = (layout.header_h - _font_height(fonts.small)) // 2
-        draw.text((width - layout.margin - stamp_w, stamp_y), timestamp, font=fonts.small, fill=255)
+        stamp_y = (layout.header_h - fonts.small_h) // 2
+        _paste_text(image, (width - layout.margin - stamp_w, stamp_y), timestamp, fonts.small, 255)
 
 
 def _draw_footer(
@@ -726,12 +1254,17 @@ def _draw_footer(
     y0 = height - layout.footer_h
     draw.rectangle((0, y0, width, height), fill=0)
     text = "  ".join(hints)
-    text_y = y0 + (layout.footer_h - _font_height(fonts.tiny)) // 2
+    text_y = y0 + (layout.footer_h - fonts.tiny_h) // 2
     draw.text((layout.margin, text_y), text, font=fonts.tiny, fill=255)
 
 
+def _fill(image: Image.Image, x0: int, y0: int, x1: int, y1: int, color: int) -> None:
+    """Fill an inclusive box like draw.rectangle(), but as a straight buffer fill."""
+    image.paste(color, (x0, y0, x1 + 1, y1 + 1))
+
+
 def _draw_labeled_bar(
-    draw: ImageDraw.ImageDraw,
+    image: Image.Image,
     x: int,
     y: int,
     width: int,
@@ -740,149 +1273,325 @@ def _draw_labeled_bar(
     percent: float,
     fonts: Fonts,
     layout: Layout,
+    frame: bool = True,
 ) -> int:
-    """Draw a labeled usage bar and return the next y coordinate."""
-    draw.text((x, y), label, font=fonts.small, fill=0)
+    """Draw a labeled usage bar and return the next y; frame=False trusts the template's empty bar."""
+    if label:
+        _paste_text(image, (x, y), label, fonts.small, 0)
     if value_text:
         value_w = _text_width(fonts.small, value_text)
-        draw.text((x + width - value_w, y), value_text, font=fonts.small, fill=0)
-    y += _font_height(fonts.small) + 1
-    bar_h = max(6, _font_height(fonts.tiny))
-    draw.rectangle((x, y, x + width, y + bar_h), outline=0, fill=255)
+        _paste_text(image, (x + width - value_w, y), value_text, fonts.small, 0)
+    y += fonts.small_h + 1
+    bar_h = max(6, fonts.tiny_h)
     clamped = max(0.0, min(percent, 100.0))
     fill_w = int(width * clamped / 100.0)
-    if fill_w:
-        draw.rectangle((x, y, x + fill_w, y + bar_h), fill=0)
+    if frame:
+        # Same pixels as rectangle(outline=0, fill=255) plus the fill, minus the generic rasterizer.
+        _fill(image, x, y, x + width, y + bar_h, 0)
+        if fill_w + 1 < width:
+            _fill(image, x + fill_w + 1, y + 1, x + width - 1, y + bar_h - 1, 255)
+    elif fill_w:
+        _fill(image, x, y, x + fill_w, y + bar_h, 0)
     return y + bar_h + layout.gutter
 
 
-def _center_text(draw: ImageDraw.ImageDraw, width: int, y: int, text: str, font: ImageFont.ImageFont) -> int:
+# Everything a bar value string can contain: percents, temperatures, byte sizes.
+BAR_VALUE_GLYPHS = "0123456789.%C/BKMGTP "
+
+
+def _values_clear_bars(fonts: Fonts) -> bool:
+    """Tell whether bar value text stops above the bar interior, so the frame never needs repainting."""
+    try:
+        ink_bottom = fonts.small.getbbox(BAR_VALUE_GLYPHS)[3]
+    except Exception:
+        return False
+    # The bar's top outline row sits at small_h + 1 and is black anyway.
+    return ink_bottom <= fonts.small_h + 2
+
+
+def _center_text(
+    image: Image.Image,
+    width: int,
+    y: int,
+    text: str,
+    font: ImageFont.ImageFont,
+    font_h: int,
+) -> int:
     """Center text horizontally and return the next y coordinate."""
     text_w = _text_width(font, text)
     x = max(0, (width - text_w) // 2)
-    draw.text((x, y), text, font=font, fill=0)
-    return y + _font_height(font) + 1
+    _paste_text(image, (x, y), text, font, 0)
+    return y + font_h + 1
 
 
-def _render_status(
-    image: Image.Image,
-    stats: Stats,
+PAGE_NAMES = ("status", "network", "piratebox")
+PAGE_TITLES = {"status": "STATUS", "network": "NETWORK", "piratebox": "BOX"}
+STATUS_BARS = ("CPU", "MEM", "DISK")
+# Resets the given frame buffer to one page's template, draws the dynamic bits, returns it.
+Renderer = Callable[[Stats, "Image.Image"], "Image.Image"]
+
+
+def _status_column(width: int, logo: Optional[Image.Image], layout: Layout) -> tuple[int, int]:
+    """Return the left edge and width of the status bars, leaving room for the logo."""
+    x = layout.margin
+    right_edge = width - layout.margin
+    if logo:
+        logo_x = width - layout.margin - logo.width
+        right_edge = max(x + 10, logo_x - layout.gutter)
+    return x, max(10, right_edge - x)
+
+
+def _status_template(
+    width: int,
+    height: int,
     logo: Optional[Image.Image],
     fonts: Fonts,
     layout: Layout,
-) -> None:
-    """Render the status page with CPU, mem, disk, and uptime."""
+) -> Image.Image:
+    """Rasterize the parts of the status page that never change."""
+    image = _prepare_canvas(width, height)
     draw = ImageDraw.Draw(image)
-    _draw_header(draw, image.width, "STATUS", stats.timestamp, fonts, layout)
-    _draw_footer(draw, image.width, image.height, fonts, layout)
+    _draw_header(draw, width, PAGE_TITLES["status"], fonts, layout)
+    _draw_footer(draw, width, height, fonts, layout)
 
-    x = layout.margin
     y = layout.header_h + layout.gutter
-    right_edge = image.width - layout.margin
     if logo:
-        logo_x = image.width - layout.margin - logo.width
-        logo_y = y
-        image.paste(logo, (logo_x, logo_y))
-        right_edge = max(x + 10, logo_x - layout.gutter)
+        image.paste(logo, (width - layout.margin - logo.width, y))
+    x, col_width = _status_column(width, logo, layout)
+    for label in STATUS_BARS:
+        y = _draw_labeled_bar(image, x, y, col_width, label, "", 0.0, fonts, layout)
+    return image
 
-    col_width = max(10, right_edge - x)
-    cpu_value = f"{stats.cpu_usage:.0f}%"
-    if stats.cpu_temp is not None:
-        cpu_value = f"{stats.cpu_usage:.0f}% {stats.cpu_temp:.1f}C"
-    y = _draw_labeled_bar(
-        draw,
-        x,
-        y,
-        col_width,
-        "CPU",
-        cpu_value,
-        stats.cpu_usage,
-        fonts,
-        layout,
-    )
-    mem_percent = 0.0 if stats.mem_total == 0 else (stats.mem_used / stats.mem_total) * 100
-    y = _draw_labeled_bar(
-        draw,
-        x,
-        y,
-        col_width,
-        "MEM",
-        f"{_format_bytes(stats.mem_used)}/{_format_bytes(stats.mem_total)}",
-        mem_percent,
-        fonts,
-        layout,
-    )
-    disk_percent = 0.0 if stats.disk_total == 0 else (stats.disk_used / stats.disk_total) * 100
-    y = _draw_labeled_bar(
-        draw,
-        x,
-        y,
-        col_width,
-        "DISK",
-        f"{_format_bytes(stats.disk_used)}/{_format_bytes(stats.disk_total)}",
-        disk_percent,
-        fonts,
-        layout,
-    )
 
-    draw.text((x, y), f"UP {stats.uptime}", font=fonts.small, fill=0)
-    y += _font_height(fonts.small) + layout.gutter
-    draw.text((x, y), f"IP {stats.ip}", font=fonts.small, fill=0)
+def _status_page(
+    template: Image.Image,
+    logo: Optional[Image.Image],
+    fonts: Fonts,
+    layout: Layout,
+) -> Renderer:
+    """Build the status renderer with its column and row geometry baked in."""
+    width = template.width
+    x, col_width = _status_column(width, logo, layout)
+    top = layout.header_h + layout.gutter
+    small = fonts.small
+    line_step = fonts.small_h + layout.gutter
+    frame = not _values_clear_bars(fonts)
+
+    def render(stats: Stats, image: Image.Image) -> Image.Image:
+        """Render CPU, mem, disk, and uptime on top of the status template."""
+        image.paste(template, (0, 0))
+        _draw_timestamp(image, width, stats.timestamp, fonts, layout)
+
+        cpu_value = f"{stats.cpu_usage:.0f}%"
+        if stats.cpu_temp is not None:
+            cpu_value = f"{stats.cpu_usage:.0f}% {stats.cpu_temp:.1f}C"
+        bars = (
+            (cpu_value, stats.cpu_usage),
+            (f"{_format_bytes(stats.mem_used)}/{_format_bytes(stats.mem_total)}", stats.mem_percent),
+            (f"{_format_bytes(stats.disk_used)}/{_format_bytes(stats.disk_total)}", stats.disk_percent),
+        )
+        # Labels and empty bars live in the template; usually only the black fill is new.
+        y = top
+        for value_text, percent in bars:
+            y = _draw_labeled_bar(image, x, y, col_width, "", value_text, percent, fonts, layout, frame)
 
+        _paste_text(image, (x, y), f"UP {stats.uptime}", small, 0)
+        _paste_text(image, (x, y + line_step), f"IP {stats.ip}", small, 0)
+        return image
 
-def _render_network(
-    image: Image.Image,
-    stats: Stats,
+    return render
+
+
+def _network_rows(fonts: Fonts, layout: Layout) -> tuple[int, int, int, int]:
+    """Return the y coordinates of the host, IP, HTTP, and tagline rows."""
+    host_y = layout.header_h + layout.gutter
+    ip_y = host_y + fonts.small_h + layout.gutter
+    http_y = ip_y + fonts.huge_h + 1 + layout.gutter
+    tagline_y = http_y + fonts.small_h + layout.gutter
+    return host_y, ip_y, http_y, tagline_y
+
+
+def _network_template(width: int, height: int, hostname: str, fonts: Fonts, layout: Layout) -> Image.Image:
+    """Rasterize the network page chrome, hostname included; it is not going anywhere."""
+    image = _prepare_canvas(width, height)
+    draw = ImageDraw.Draw(image)
+    _draw_header(draw, width, PAGE_TITLES["network"], fonts, layout)
+    _draw_footer(draw, width, height, fonts, layout)
+
+    host_y, _, _, tagline_y = _network_rows(fonts, layout)
+    draw.text((layout.margin, host_y), f"HOST {hostname}", font=fonts.small, fill=0)
+    draw.text((layout.margin, tagline_y), "INTERNET: NO, BY DESIGN.", font=fonts.small, fill=0)
+    return image
+
+
+def _network_page(template: Image.Image, fonts: Fonts, layout: Layout) -> Renderer:
+    """Build the network renderer with its row positions baked in."""
+    width = template.width
+    margin = layout.margin
+    _, ip_y, http_y, _ = _network_rows(fonts, layout)
+    small = fonts.small
+
+    def render(stats: Stats, image: Image.Image) -> Image.Image:
+        """Render the IP info on top of the network template."""
+        image.paste(template, (0, 0))
+        _draw_timestamp(image, width, stats.timestamp, fonts, layout)
+
+        ip_text = stats.ip if stats.ip else "unknown"
+        _center_text(image, width, ip_y, ip_text, fonts.huge, fonts.huge_h)
+
+        http_line = f"http://{ip_text}" if ip_text != "unknown" else "http://pirate.box"
+        _paste_text(image, (margin, http_y), f"HTTP {http_line}", small, 0)
+        return image
+
+    return render
+
+
+PIRATEBOX_COUNTERS = ("FILES", "THREADS", "POSTS")
+
+
+def _piratebox_rows(height: int, fonts: Fonts, layout: Layout) -> tuple[list[tuple[int, int]], int]:
+    """Return (label_y, value_y) per counter plus the tagline y coordinate."""
+    rows: list[tuple[int, int]] = []
+    y = layout.header_h + layout.gutter
+    for _ in PIRATEBOX_COUNTERS:
+        rows.append((y, y + fonts.small_h))
+        y += fonts.small_h + fonts.large_h + layout.gutter
+    tagline_y = min(y, height - layout.footer_h - fonts.small_h - layout.gutter)
+    return rows, tagline_y
+
+
+def _piratebox_template(width: int, height: int, fonts: Fonts, layout: Layout) -> Image.Image:
+    """Rasterize the PirateBox stats page labels."""
+    image = _prepare_canvas(width, height)
+    draw = ImageDraw.Draw(image)
+    _draw_header(draw, width, PAGE_TITLES["piratebox"], fonts, layout)
+    _draw_footer(draw, width, height, fonts, layout)
+
+    rows, tagline_y = _piratebox_rows(height, fonts, layout)
+    for label, (label_y, _) in zip(PIRATEBOX_COUNTERS, rows):
+        draw.text((layout.margin, label_y), label, font=fonts.small, fill=0)
+    draw.text((layout.margin, tagline_y), "LOCAL ONLY. NO CLOUD.", font=fonts.small, fill=0)
+    return image
+
+
+def _piratebox_page(template: Image.Image, fonts: Fonts, layout: Layout) -> Renderer:
+    """Build the PirateBox counters renderer with its row positions baked in."""
+    width = template.width
+    margin = layout.margin
+    rows, _ = _piratebox_rows(template.height, fonts, layout)
+    value_ys = tuple(value_y for _, value_y in rows)
+    large = fonts.large
+
+    def render(stats: Stats, image: Image.Image) -> Image.Image:
+        """Render the PirateBox counters on top of their template."""
+        image.paste(template, (0, 0))
+        _draw_timestamp(image, width, stats.timestamp, fonts, layout)
+
+        for value, value_y in zip((stats.files, stats.threads, stats.posts), value_ys):
+            _paste_text(image, (margin, value_y), str(value), large, 0)
+        return image
+
+    return render
+
+
+@dataclass(slots=True)
+class PageTemplates:
+    """Static layer of every page, rasterized once and copied per refresh."""
+    status: Image.Image
+    network: Image.Image
+    piratebox: Image.Image
+    stamp: dict[str, Box]
+
+    def stamp_box(self, page_name: str) -> Box:
+        """Return the header area right of the title, where the timestamp lives."""
+        return self.stamp[page_name]
+
+
+def _build_templates(
+    width: int,
+    height: int,
+    logo: Optional[Image.Image],
     hostname: str,
     fonts: Fonts,
     layout: Layout,
-) -> None:
-    """Render the network page with host and IP info."""
-    draw = ImageDraw.Draw(image)
-    _draw_header(draw, image.width, "NETWORK", stats.timestamp, fonts, layout)
-    _draw_footer(draw, image.width, image.height, fonts, layout)
+) -> PageTemplates:
+    """Draw every page's static layer; fonts and layout never change at runtime."""
+    return PageTemplates(
+        status=_status_template(width, height, logo, fonts, layout),
+        network=_network_template(width, height, hostname, fonts, layout),
+        piratebox=_piratebox_template(width, height, fonts, layout),
+        stamp={
+            name: (
+                min(width, layout.margin + _text_width(fonts.medium, PAGE_TITLES[name]) + layout.gutter),
+                0,
+                width,
+                layout.header_h + 1,
+            )
+            for name in PAGE_NAMES
+        },
+    )
 
-    y = layout.header_h + layout.gutter
-    draw.text((layout.margin, y), f"HOST {hostname}", font=fonts.small, fill=0)
-    y += _font_height(fonts.small) + layout.gutter
 
-    ip_text = stats.ip if stats.ip else "unknown"
-    y = _center_text(draw, image.width, y, ip_text, fonts.huge)
-    y += layout.gutter
+def _restamp(
+    frame: Image.Image,
+    image: Image.Image,
+    box: Box,
+    timestamp: str,
+    fonts: Fonts,
+    layout: Layout,
+) -> Image.Image:
+    """Copy a rendered frame into another buffer and swap its header timestamp for a new one."""
+    image.paste(frame, (0, 0))
+    _fill(image, box[0], box[1], box[2] - 1, box[3] - 1, 0)
+    _draw_timestamp(image, image.width, timestamp, fonts, layout)
+    return image
+
 
-    http_line = f"http://{ip_text}" if ip_text != "unknown" else "http://pirate.box"
-    draw.text((layout.margin, y), f"HTTP {http_line}", font=fonts.small, fill=0)
-    y += _font_height(fonts.small) + layout.gutter
-    draw.text((layout.margin, y), "INTERNET: NO, BY DESIGN.", font=fonts.small, fill=0)
+def _build_pages(
+    templates: PageTemplates,
+    logo: Optional[Image.Image],
+    fonts: Fonts,
+    layout: Layout,
+) -> tuple[tuple[str, Renderer, Box], ...]:
+    """Build the page table once the display size, fonts, and templates are known.
+
+    Each entry carries everything a tick needs about its page: name, renderer,
+    and timestamp box, so the loop does one index and no per-page lookups.
+    """
+    renderers = (
+        _status_page(templates.status, logo, fonts, layout),
+        _network_page(templates.network, fonts, layout),
+        _piratebox_page(templates.piratebox, fonts, layout),
+    )
+    return tuple(
+        (name, render, templates.stamp_box(name)) for name, render in zip(PAGE_NAMES, renderers)
+    )
 
 
-def _render_piratebox(image: Image.Image, stats: Stats, fonts: Fonts, layout: Layout) -> None:
-    """Render the PirateBox stats page."""
-    draw = ImageDraw.Draw(image)
-    _draw_header(draw, image.width, "BOX", stats.timestamp, fonts, layout)
-    _draw_footer(draw, image.width, image.height, fonts, layout)
+# Past this share of changed pixels a partial refresh ghosts more than it saves.
+PARTIAL_MAX_AREA = 0.6
 
-    y = layout.header_h + layout.gutter
-    for label, value in (("FILES", stats.files), ("THREADS", stats.threads), ("POSTS", stats.posts)):
-        draw.text((layout.margin, y), label, font=fonts.small, fill=0)
-        y += _font_height(fonts.small)
-        draw.text((layout.margin, y), str(value), font=fonts.large, fill=0)
-        y += _font_height(fonts.large) + layout.gutter
 
-    y = min(y, image.height - layout.footer_h - _font_height(fonts.small) - layout.gutter)
-    draw.text((layout.margin, y), "LOCAL ONLY. NO CLOUD.", font=fonts.small, fill=0)
+def _changed_box(prev: Image.Image, curr: Image.Image) -> Optional[Box]:
+    """Return the bounding box of pixels that differ between two frames."""
+    if prev.size != curr.size or prev.mode != "1" or curr.mode != "1":
+        return (0, 0, curr.width, curr.height)
+    return ImageChops.logical_xor(prev, curr).getbbox()
 
 
-PAGES = (
-    ("status", _render_status),
-    ("network", _render_network),
-    ("piratebox", _render_piratebox),
-)
+def _box_area(box: Box) -> int:
+    """Return the pixel area of a box, in case anyone forgot geometry."""
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+
+def _frame_digest(image: Image.Image) -> bytes:
+    """Fingerprint a rendered frame; a packed 1-bit buffer is a few KB, hashing it is free."""
+    return hashlib.blake2b(image.tobytes(), digest_size=16).digest()
 
 
-def _collect_stats(db_path: Path, data_path: Path, prev_cpu: Optional[tuple[int, int]]) -> tuple[Stats, tuple[int, int]]:
-    """Collect system stats and return a Stats object plus CPU state."""
-    cpu_usage, cpu_state = _read_cpu_usage(prev_cpu)
+def _collect_stats(db_path: Path, data_path: Path, cpu: CpuSampler) -> Stats:
+    """Collect system stats into a Stats object."""
+    cpu_usage = cpu.usage()
     cpu_temp = _read_cpu_temp()
     mem_used, mem_total = _read_mem()
     disk_used, disk_total = _read_disk(data_path)
@@ -891,49 +1600,43 @@ def _collect_stats(db_path: Path, data_path: Path, prev_cpu: Optional[tuple[int,
     files, threads, posts = _read_counts(db_path)
     timestamp = time.strftime("%H:%M")
 
-    return (
-        Stats(
-            cpu_usage=cpu_usage,
-            cpu_temp=cpu_temp,
-            mem_used=mem_used,
-            mem_total=mem_total,
-            disk_used=disk_used,
-            disk_total=disk_total,
-            uptime=uptime,
-            ip=ip,
-            files=files,
-            threads=threads,
-            posts=posts,
-            timestamp=timestamp,
-        ),
-        cpu_state,
+    return Stats(
+        cpu_usage=cpu_usage,
+        cpu_temp=cpu_temp,
+        mem_used=mem_used,
+        mem_total=mem_total,
+        disk_used=disk_used,
+        disk_total=disk_total,
+        mem_percent=_percent(mem_used, mem_total),
+        disk_percent=_percent(disk_used, disk_total),
+        uptime=uptime,
+        ip=ip,
+        files=files,
+        threads=threads,
+        posts=posts,
+        timestamp=timestamp,
     )
 
 
 def main() -> None:
     """CLI entry point that drives the e-paper refresh loop."""
+    config = EpdConfig.from_env()
     parser = argparse.ArgumentParser(description="PirateBox e-Paper status screen")
-    parser.add_argument("--interval", type=int, default=int(os.getenv("PIRATEBOX_EPD_INTERVAL", "30")))
-    parser.add_argument("--rotate", type=int, default=int(os.getenv("PIRATEBOX_EPD_ROTATE", "0")))
-    parser.add_argument("--logo", type=str, default=os.getenv("PIRATEBOX_EPD_LOGO", str(DEFAULT_LOGO)))
-    parser.add_argument("--buttons", type=str, default=os.getenv("PIRATEBOX_EPD_BUTTON_PINS", DEFAULT_BUTTON_PINS))
+    parser.add_argument("--interval", type=int, default=config.interval)
+    parser.add_argument("--rotate", type=int, default=config.rotate)
+    parser.add_argument("--logo", type=str, default=config.logo)
+    parser.add_argument("--buttons", type=str, default=config.buttons)
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
     parser.add_argument(
         "--driver",
         type=str,
-        default=os.getenv("PIRATEBOX_EPD_DRIVER", "auto"),
+        default=config.driver,
         help="EPD driver to use: auto, rpi_epd2in7, waveshare_epd",
     )
     args = parser.parse_args()
 
-    try:
-        full_refresh_every = int(os.getenv("PIRATEBOX_EPD_FULL_REFRESH_EVERY", "10"))
-    except ValueError:
-        full_refresh_every = 10
-    if full_refresh_every < 0:
-        full_refresh_every = 0
-
-    refresh_policy = _parse_refresh_policy()
+    full_refresh_every = config.full_refresh_every
+    refresh_policy = config.refresh
 
     _debug(
         args.debug,
@@ -941,70 +1644,140 @@ def main() -> None:
         f"{args.interval}s rotate={args.rotate} driver={args.driver} buttons={args.buttons or 'none'} "
         f"full_refresh_every={full_refresh_every} refresh_on_change={int(refresh_policy.on_change)}",
     )
-    driver = _load_driver(args.driver, debug=args.debug)
+    driver = _load_driver(args.driver, debug=args.debug, module_hint=config.waveshare_module)
+    _lazy_pil()
     driver.clear()
 
-    fonts = _load_fonts(driver.width, driver.height)
+    fonts = _load_fonts(driver.width, driver.height, config.font)
     layout = _make_layout(fonts, driver.width, driver.height)
 
     state = State(force_refresh=True)
-    handler = ButtonHandler(state=state, total_pages=len(PAGES), driver=driver)
+    handler = ButtonHandler(state=state, total_pages=len(PAGE_NAMES), driver=driver)
     # Buttons: four chances to do something useful, or at least entertaining.
-    buttons = ButtonWatcher(_parse_buttons(args.buttons), handler)
+    buttons = ButtonWatcher(_parse_buttons(args.buttons, config.button_pull_up), handler)
 
     logo = _load_logo(Path(args.logo), (64, 64))
     _debug(args.debug, f"Logo: {args.logo} ({'loaded' if logo else 'missing'})")
 
-    db_path = Path(os.getenv("PIRATEBOX_DB_PATH", ROOT_DIR / "data" / "piratebox.db"))
-    data_path = Path(os.getenv("PIRATEBOX_DATA_DIR", ROOT_DIR / "data"))
+    db_path = config.db_path
+    data_path = config.data_path
     _debug(args.debug, f"DB path: {db_path}")
     _debug(args.debug, f"Data path: {data_path}")
 
-    prev_cpu: Optional[tuple[int, int]] = None
+    cpu = CpuSampler()
+    cpu.start()
+    addresses = AddressWatcher()
+    if not addresses.start():
+        _debug(args.debug, f"No netlink; IP re-resolves every {IP_CACHE_TTL}s")
     hostname = socket.gethostname()
+    templates = _build_templates(driver.width, driver.height, logo, hostname, fonts, layout)
+    pages = _build_pages(templates, logo, fonts, layout)
+    frames = FrameBuffers(driver.width, driver.height)
     loop_count = 0
     last_drawn: Optional[Stats] = None
 
     try:
         # Main loop: keep the paper fresh so it does not look like last week's news.
+        next_tick = time.monotonic()
         while True:
-            buttons.poll()
+            # Presses that came in during the last draw take effect before anything else.
+            buttons.dispatch()
             if state.sleeping:
-                time.sleep(args.interval)
+                # Nothing to draw until a button wakes the panel; park on the buttons alone.
+                cpu.pause()
+                while state.sleeping:
+                    buttons.wait(None)
+                cpu.resume()
                 continue
 
-            stats, prev_cpu = _collect_stats(db_path, data_path, prev_cpu)
-            page_name, renderer = PAGES[state.page]
-            _debug(args.debug, f"Render page={page_name} force={state.force_refresh} sleeping={state.sleeping}")
-
-            if not state.force_refresh and refresh_policy.on_change:
-                if not _stats_changed(last_drawn, stats, refresh_policy):
-                    _debug(args.debug, "No significant change; skipping refresh")
-                    time.sleep(args.interval)
+            now = time.monotonic()
+            if now < next_tick and not state.force_refresh:
+                # Block until the next scheduled refresh or a button press, whichever is first.
+                buttons.wait(next_tick - now)
+                now = time.monotonic()
+                if now < next_tick and not state.force_refresh:
                     continue
+            if now >= next_tick:
+                # A press in between does not push the schedule back.
+                next_tick = now + args.interval
+            if state.sleeping:
+                continue
 
-            canvas = _prepare_canvas(driver.width, driver.height)
-            if page_name == "status":
-                renderer(canvas, stats, logo, fonts, layout)
-            elif page_name == "network":
-                renderer(canvas, stats, hostname, fonts, layout)
-            else:
-                renderer(canvas, stats, fonts, layout)
+            stats = _collect_stats(db_path, data_path, cpu)
+            page_name, render, stamp = pages[state.page]
+            if args.debug:
+                _debug(True, f"Render page={page_name} force={state.force_refresh} sleeping={state.sleeping}")
 
+            image: Optional[Image.Image] = None
+            if not state.force_refresh and refresh_policy.on_change:
+                same_page = state.last_page == state.page
+                if not _stats_changed(last_drawn, stats, refresh_policy):
+                    if state.last_image is None or (same_page and stats.timestamp == state.last_timestamp):
+                        _debug(args.debug, "No significant change; skipping refresh")
+                        continue
+                    if same_page:
+                        # Only the clock moved: restamp the frame on the panel instead of rendering anew.
+                        _debug(args.debug, "Only the timestamp changed; restamping last frame")
+                        image = _restamp(
+                            state.last_image, frames.back(state.last_image), stamp, stats.timestamp, fonts, layout
+                        )
+                    else:
+                        _debug(args.debug, "Last frame is from another page; rendering this one")
+
+            restamped = image is not None
+            if image is None:
+                # The shown frame is kept intact for restamping and the next diff.
+                image = render(stats, frames.back(state.last_image))
+
+            canvas = image
             if args.rotate:
-                canvas = canvas.rotate(args.rotate, expand=True)
+                canvas = _rotate(canvas, args.rotate)
 
             full_refresh = state.force_refresh
             if full_refresh_every:
                 full_refresh = full_refresh or loop_count % full_refresh_every == 0
-            driver.draw(canvas, full_refresh)
+
+            # The panel already shows these exact pixels; a refresh would only add ghosting.
+            digest = _frame_digest(canvas)
+            # A due full refresh is skipped only if no partial has drawn over the last full frame.
+            on_panel = digest == state.last_digest
+            unchanged = on_panel and (not full_refresh or digest == state.last_full_digest)
+            if unchanged and not state.force_refresh:
+                _debug(args.debug, "Frame unchanged; skipping refresh")
+                # Only stats the panel really shows may become the baseline for the thresholds.
+                if on_panel and not restamped:
+                    last_drawn = stats
+                loop_count += 1
+                continue
+
+            # After a wake or page switch the panel holds something else entirely.
+            bbox = None
+            if not full_refresh and state.last_canvas is not None:
+                bbox = _changed_box(state.last_canvas, canvas)
+                if bbox and _box_area(bbox) > PARTIAL_MAX_AREA * canvas.width * canvas.height:
+                    _debug(args.debug, f"Most of the frame changed {bbox}; doing a full refresh")
+                    full_refresh = True
+                    bbox = None
+            # Cleared first, so a press handled from here on still forces the next frame.
             state.force_refresh = False
-            last_drawn = stats
+            driver.draw(canvas, full_refresh, bbox)
+            state.last_digest = digest
+            if full_refresh:
+                state.last_full_digest = digest
+            state.last_image = image
+            state.last_page = state.page
+            state.last_canvas = canvas
+            state.last_timestamp = stats.timestamp
+            if not restamped:
+                # The bars still show last_drawn's values, so keep comparing against those.
+                last_drawn = stats
             loop_count += 1
-            time.sleep(args.interval)
     except KeyboardInterrupt:
         pass
     finally:
+        cpu.stop()
+        addresses.stop()
+        _close_proc()
         buttons.close()
         try:
             driver.sleep()
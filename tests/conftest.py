@@ -1,6 +1,9 @@
 """Pytest fixtures for PirateBox, the only place we're optimistic on purpose."""
 
 import io
+import os
+import shutil
+import sqlite3
 import sys
 from pathlib import Path
 
@@ -8,34 +11,88 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 
 from app import db
 from app.main import app as fastapi_app
 
+# Children first, so nothing trips over a foreign key on the way out.
+TABLES = ("forum_posts", "forum_threads", "chat_messages", "files")
 
-@pytest.fixture()
-def storage(tmp_path, monkeypatch):
-    """Point the DB and files dir at tmp space so tests can break things safely."""
-    db_path = tmp_path / "piratebox.db"
-    files_dir = tmp_path / "files"
-
-    monkeypatch.setattr(db, "DB_PATH", db_path)
-    monkeypatch.setattr(db, "FILES_DIR", files_dir)
-    monkeypatch.setattr(db, "MAX_UPLOAD_MB", 1)
 
-    db.init_db()
-    return tmp_path
+@pytest.fixture(scope="module")
+def module_storage(tmp_path_factory):
+    """Build the schema once per module, in RAM, with the files dir in tmp space."""
+    root = tmp_path_factory.mktemp("storage")
+    # Memory DBs are per process anyway; the worker id keeps names readable under xdist.
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+    db_uri = f"file:pb_{worker}_{root.name}?mode=memory&cache=shared"
+    # A shared-cache DB dies with its last connection; this one outlives pool reopenings.
+    keeper = sqlite3.connect(db_uri, uri=True)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(db, "DB_PATH", db_uri)
+        patch.setattr(db, "FILES_DIR", root / "files")
+        patch.setattr(db, "MAX_UPLOAD_MB", 1)
+        db.init_db()
+        yield root
+        db.close_db()
+    keeper.close()
 
 
 @pytest.fixture()
-def client(storage):
-    """Provide a test client wired to the FastAPI app."""
+def storage(module_storage):
+    """Hand each test empty tables and an empty files dir so tests can break things safely."""
+    with db.write_conn() as conn:
+        for table in TABLES:
+            conn.execute(f"DELETE FROM {table}")
+        # Ids restart at 1, like they would on a fresh database.
+        conn.execute("DELETE FROM sqlite_sequence")
+    db._reset_caches()
+    shutil.rmtree(db.FILES_DIR, ignore_errors=True)
+    db.FILES_DIR.mkdir(parents=True)
+    return module_storage
+
+
+@pytest.fixture(scope="module")
+def app_client(module_storage):
+    """Boot the FastAPI app once per module."""
     with TestClient(fastapi_app) as test_client:
         yield test_client
 
 
+@pytest.fixture(scope="module")
+def anyio_backend():
+    """Run async tests on plain asyncio; nobody here ships trio."""
+    return "asyncio"
+
+
+@pytest.fixture(scope="module")
+async def async_app_client(module_storage):
+    """Boot the app on the test loop and share one httpx client per module."""
+    # ASGITransport skips lifespan, and the chat batcher must live on the loop the tests use.
+    # Never mix this with app_client in one module: each would start the batcher on its own loop.
+    async with fastapi_app.router.lifespan_context(fastapi_app):
+        transport = httpx.ASGITransport(app=fastapi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as test_client:
+            yield test_client
+
+
+@pytest.fixture()
+def async_client(storage, async_app_client):
+    """Provide the module's async client with a clean slate, cookies included."""
+    async_app_client.cookies.clear()
+    return async_app_client
+
+
+@pytest.fixture()
+def client(storage, app_client):
+    """Provide the module's test client with no cookies left over from the last test."""
+    app_client.cookies.clear()
+    return app_client
+
+
 @pytest.fixture()
 def sample_file():
     """Return a small file payload for upload tests."""
@@ -7,8 +7,24 @@ def test_captive_portal_redirect(client):
     assert response.headers["location"] == "/captive"
 
 
+def test_captive_probe_after_ack(client):
+    """Acknowledged devices get the answers their OS expects."""
+    client.cookies.set("piratebox_captive_ack", "1")
+    assert client.get("/generate_204").status_code == 204
+    assert client.get("/ncsi.txt").text == "Microsoft NCSI"
+    assert client.get("/hotspot-detect.html").text == "<html><body>Success</body></html>"
+
+
 def test_unknown_path(client):
     """Unknown paths should stay unknown."""
     response = client.get("/definitely-missing")
     assert response.status_code == 404
     assert response.text == "Not found"
+
+
+def test_favicon_and_robots(client):
+    """Browser noise gets tiny canned answers instead of a 404."""
+    assert client.get("/favicon.ico").status_code == 204
+    robots = client.get("/robots.txt")
+    assert robots.status_code == 200
+    assert robots.text.startswith("User-agent: *")
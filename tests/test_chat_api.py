@@ -1,31 +1,116 @@
 """Chat API tests: proof the shouting still works when nobody listens."""
 
-def test_chat_page(client):
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app import db
+from app.main import ChatBatcher
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_chat_page(async_client):
     """Chat page loads and name-drops the shoutbox."""
-    response = client.get("/chat")
+    response = await async_client.get("/chat")
     assert response.status_code == 200
     assert "Shoutbox" in response.text
 
 
-def test_chat_requires_message(client):
+async def test_chat_requires_message(async_client):
     """Empty messages get bounced like they deserve."""
-    response = client.post("/api/chat/messages", data={"nickname": "Test", "message": ""})
+    response = await async_client.post(
+        "/api/chat/messages", data={"nickname": "Test", "message": ""}
+    )
     assert response.status_code == 400
 
 
-def test_chat_post_and_fetch(client):
+async def test_chat_post_and_fetch(async_client):
     """Posting a message should show up in the fetch call."""
-    post = client.post("/api/chat/messages", data={"nickname": "Test", "message": "hello"})
+    post = await async_client.post(
+        "/api/chat/messages", data={"nickname": "Test", "message": "hello"}
+    )
     assert post.status_code == 200
     payload = post.json()
     assert payload["message"]["message"] == "hello"
 
-    fetch = client.get("/api/chat/messages?after_id=0")
+    # Both reads only need the stored row, so they can go out together.
+    fetch, after = await asyncio.gather(
+        async_client.get("/api/chat/messages?after_id=0"),
+        async_client.get(f"/api/chat/messages?after_id={payload['message']['id']}"),
+    )
     assert fetch.status_code == 200
     messages = fetch.json()["messages"]
     assert len(messages) == 1
     assert messages[0]["message"] == "hello"
 
-    after = client.get(f"/api/chat/messages?after_id={messages[0]['id']}")
     assert after.status_code == 200
     assert after.json()["messages"] == []
+
+
+async def test_chat_posts_in_one_window_share_a_batch(async_client, monkeypatch):
+    """Posts landing together go through the batcher and all come back stored."""
+
+    def unbatched(*args):
+        raise AssertionError("chat post skipped the batcher")
+
+    monkeypatch.setattr(db, "insert_chat_message", unbatched)
+    posts = await asyncio.gather(
+        *(
+            async_client.post("/api/chat/messages", data={"nickname": "Test", "message": f"m{i}"})
+            for i in range(5)
+        )
+    )
+    ids = [post.json()["message"]["id"] for post in posts]
+    assert sorted(ids) == list(range(1, 6))
+
+    fetch = await async_client.get("/api/chat/messages?after_id=0")
+    assert sorted(m["message"] for m in fetch.json()["messages"]) == [f"m{i}" for i in range(5)]
+
+
+async def test_chat_long_poll_times_out_empty(async_client):
+    """A long poll with nothing new should give up quietly after `wait`."""
+    response = await async_client.get("/api/chat/messages?after_id=0&wait=0.05")
+    assert response.status_code == 200
+    assert response.json()["messages"] == []
+
+
+async def test_chat_long_poll_wakes_on_post(async_client):
+    """A waiting poll should return as soon as a message lands."""
+    pending = asyncio.create_task(async_client.get("/api/chat/messages?after_id=0&wait=10"))
+    await asyncio.sleep(0.1)
+    started = time.monotonic()
+    await async_client.post("/api/chat/messages", data={"nickname": "Test", "message": "wake up"})
+    response = await asyncio.wait_for(pending, timeout=5)
+
+    assert time.monotonic() - started < 5
+    assert [m["message"] for m in response.json()["messages"]] == ["wake up"]
+
+
+async def test_chat_batcher_stop_mid_flush_answers_every_sender(storage, monkeypatch):
+    """Stopping while a batch is being written leaves no sender waiting forever."""
+    writing = threading.Event()
+    release = threading.Event()
+    real_insert = db.insert_chat_messages
+
+    def slow_insert(entries):
+        writing.set()
+        release.wait(5)
+        return real_insert(entries)
+
+    monkeypatch.setattr(db, "insert_chat_messages", slow_insert)
+    batcher = ChatBatcher(window_ms=0)
+    batcher.start()
+    senders = [asyncio.create_task(batcher.submit("Test", f"m{i}")) for i in range(2)]
+    while not writing.is_set():
+        await asyncio.sleep(0.01)
+
+    stopping = asyncio.create_task(batcher.stop())
+    await asyncio.sleep(0.05)
+    release.set()
+    await asyncio.wait_for(stopping, timeout=5)
+
+    done, pending = await asyncio.wait(senders, timeout=1)
+    assert not pending
@@ -2,10 +2,15 @@
 
 import hashlib
 import io
+import sqlite3
+import tempfile
+from datetime import datetime, timezone
 
 import pytest
+from fastapi.testclient import TestClient
 
 from app import db
+from app.main import app as fastapi_app
 
 
 def test_normalize_nickname_defaults():
@@ -26,9 +31,17 @@ def test_normalize_message():
     """Messages normalize whitespace and respect the max length."""
     assert db.normalize_message(None, max_len=10) == ""
     assert db.normalize_message("  hello   world ", max_len=20) == "hello world"
+    assert db.normalize_message("hello\t\n world\u00a0again", max_len=30) == "hello world again"
     assert db.normalize_message("abcdef", max_len=3) == "abc"
 
 
+def test_utc_now_matches_isoformat(monkeypatch):
+    """Timestamps keep the old datetime.isoformat() shape, minus the datetime."""
+    monkeypatch.setattr(db.time, "time", lambda: 1700000000.75)
+    expected = datetime.fromtimestamp(1700000000, timezone.utc).isoformat()
+    assert db._utc_now() == expected == "2023-11-14T22:13:20+00:00"
+
+
 def test_store_upload_and_list_files(storage):
     """Uploads should land on disk and appear in listings."""
     content = b"piratebox data"
@@ -49,6 +62,68 @@ def test_store_upload_and_list_files(storage):
     assert record.sha256 == digest
 
 
+def test_store_upload_deferred_hash(storage):
+    """Deferred uploads save first and get their digest from finalize_upload."""
+    content = b"hash me later"
+    record = db.store_upload(io.BytesIO(content), "later.txt", defer_hash=True)
+    assert record.sha256 == db.HASH_PENDING
+    assert db.list_files()[0].sha256 == db.HASH_PENDING
+
+    digest = hashlib.sha256(content).hexdigest()
+    assert db.finalize_upload(record.id) == digest
+    assert db.get_file(record.id).sha256 == digest
+    assert db.list_files()[0].sha256 == digest
+
+
+def test_finalize_upload_failure_stays_pending(storage, caplog):
+    """A hash that blows up is logged and left pending for the next attempt."""
+    content = b"not there yet"
+    record = db.store_upload(io.BytesIO(content), "moved.txt", defer_hash=True)
+    stored = db.FILES_DIR / record.stored_name
+    stored.rename(stored.with_suffix(".away"))
+
+    assert db.finalize_upload(record.id) is None
+    assert db.get_file(record.id).sha256 == db.HASH_PENDING
+    assert "will retry" in caplog.text
+
+    stored.with_suffix(".away").rename(stored)
+    assert db.finalize_pending_uploads() == 1
+    assert db.get_file(record.id).sha256 == hashlib.sha256(content).hexdigest()
+
+
+def test_startup_hashes_pending_uploads(storage):
+    """Booting the app finishes any hash a restart cut short."""
+    content = b"left hanging"
+    record = db.store_upload(io.BytesIO(content), "hanging.txt", defer_hash=True)
+
+    with TestClient(fastapi_app):
+        assert db.get_file(record.id).sha256 == hashlib.sha256(content).hexdigest()
+
+
+def test_store_upload_copies_spooled_file(storage):
+    """A spool already on disk is copied in the kernel, from wherever it was left."""
+    content = b"spooled" * 1000
+    spool = tempfile.SpooledTemporaryFile(max_size=16)
+    spool.write(b"skip" + content)
+    spool.seek(4)
+
+    record = db.store_upload(spool, "spooled.bin", defer_hash=True)
+    assert record.size_bytes == len(content)
+    assert (db.FILES_DIR / record.stored_name).read_bytes() == content
+
+
+def test_store_upload_blake3(storage, monkeypatch):
+    """PIRATEBOX_HASH_ALGO=blake3 swaps the digest, inline and deferred alike."""
+    blake3 = pytest.importorskip("blake3")
+    monkeypatch.setattr(db, "HASH_ALGO", "blake3")
+    content = b"fast hashing, same paranoia"
+    digest = blake3.blake3(content).hexdigest()
+
+    assert db.store_upload(io.BytesIO(content), "fast.txt").sha256 == digest
+    record = db.store_upload(io.BytesIO(content), "later.txt", defer_hash=True)
+    assert db.finalize_upload(record.id) == digest
+
+
 def test_store_upload_too_large(storage, monkeypatch):
     """Oversized uploads get rejected and cleaned up."""
     monkeypatch.setattr(db, "MAX_UPLOAD_MB", 0)
@@ -71,6 +146,16 @@ def test_chat_messages(storage):
     assert [m.id for m in later] == [msg2.id]
 
 
+def test_chat_message_batch_ids(storage):
+    """A batch insert reports the ids SQLite actually assigned."""
+    db.insert_chat_message("Alpha", "before")
+    batch = db.insert_chat_messages([("Beta", "one"), ("Gamma", "two"), ("Delta", "three")])
+
+    stored = db.list_chat_messages(after_id=0)
+    assert stored[1:] == batch
+    assert db.insert_chat_messages([]) == []
+
+
 def test_forum_threads_and_posts(storage):
     """Threads and replies should be persisted in order."""
     thread_id = db.create_thread("Test thread", "Sam", "first")
@@ -89,3 +174,89 @@ def test_forum_threads_and_posts(storage):
 
     posts = db.list_posts(thread_id)
     assert len(posts) == 2
+
+
+def test_thread_counters_follow_replies(storage):
+    """Thread summaries should count replies without re-scanning posts."""
+    thread_id = db.create_thread("Counters", "Sam", "first")
+    assert db.get_thread(thread_id).post_count == 1
+    reply = db.insert_post(thread_id, "Alex", "second")
+
+    thread = db.get_thread(thread_id)
+    assert thread.post_count == 2
+    assert thread.last_activity == reply.created_at
+
+
+def test_init_db_backfills_thread_counters(tmp_path, monkeypatch):
+    """Databases from before the counter columns get migrated in place."""
+    db_path = tmp_path / "legacy.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE forum_threads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                nickname TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            CREATE TABLE forum_posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                thread_id INTEGER NOT NULL,
+                nickname TEXT NOT NULL,
+                message TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            INSERT INTO forum_threads (title, nickname, created_at)
+            VALUES ('Old', 'Sam', '2024-01-01T00:00:00+00:00');
+            INSERT INTO forum_posts (thread_id, nickname, message, created_at)
+            VALUES (1, 'Sam', 'first', '2024-01-01T00:00:00+00:00'),
+                   (1, 'Alex', 'second', '2024-01-02T00:00:00+00:00');
+            """
+        )
+    conn.close()
+
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    monkeypatch.setattr(db, "FILES_DIR", tmp_path / "files")
+    db.init_db()
+
+    thread = db.get_thread(1)
+    assert thread.post_count == 2
+    assert thread.last_activity == "2024-01-02T00:00:00+00:00"
+
+
+def test_file_backed_pool_smoke(tmp_path, monkeypatch):
+    """The on-disk WAL pool, read-only readers and all, sees its own writes from an awkward dir."""
+    root = tmp_path / "box?#50%"
+    monkeypatch.setattr(db, "DB_PATH", root / "piratebox.db")
+    monkeypatch.setattr(db, "FILES_DIR", root / "files")
+    db.init_db()
+    try:
+        content = b"on a real disk"
+        record = db.store_upload(io.BytesIO(content), "disk.txt")
+        assert [f.id for f in db.list_files()] == [record.id]
+        assert db.get_file(record.id).sha256 == hashlib.sha256(content).hexdigest()
+        assert (db.FILES_DIR / record.stored_name).read_bytes() == content
+
+        msg = db.insert_chat_message("Sam", "ahoy")
+        assert [m.id for m in db.list_chat_messages()] == [msg.id]
+        assert db.list_chat_messages(after_id=msg.id) == []
+
+        with db.read_conn() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    finally:
+        db.close_db()
+
+
+def test_listing_cache_invalidates_on_write(storage):
+    """Cached listings must notice new threads, replies, and files."""
+    assert db.list_threads() == []
+    assert db.list_files() == []
+
+    thread_id = db.create_thread("Fresh", "Sam", "first")
+    assert [t.id for t in db.list_threads()] == [thread_id]
+
+    db.insert_post(thread_id, "Alex", "second")
+    assert db.list_threads()[0].post_count == 2
+
+    db.store_upload(io.BytesIO(b"cache me"), "cache.txt")
+    assert len(db.list_files()) == 1
@@ -0,0 +1,227 @@
+"""E-paper loop tests: a fake panel, since the real one takes its time blinking."""
+
+import dataclasses
+import importlib.util
+import sys
+import threading
+import types
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("PIL")
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _load_epaper():
+    """Import scripts/epaper_hat.py, which was never meant to be a package."""
+    spec = importlib.util.spec_from_file_location("epaper_hat", ROOT / "scripts" / "epaper_hat.py")
+    module = importlib.util.module_from_spec(spec)
+    # Slotted dataclasses look their module up by name while being built.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+epaper = _load_epaper()
+
+BASE_STATS = epaper.Stats(
+    cpu_usage=10.0,
+    cpu_temp=40.0,
+    mem_used=1 << 20,
+    mem_total=1 << 30,
+    disk_used=1 << 30,
+    disk_total=1 << 34,
+    mem_percent=0.1,
+    disk_percent=6.25,
+    uptime="1m",
+    ip="10.0.0.1",
+    files=1,
+    threads=2,
+    posts=3,
+    timestamp="11:11",
+)
+
+
+@pytest.fixture()
+def run_panel(monkeypatch, tmp_path):
+    """Run main() against a fake panel, one loop per reading, and return what was drawn.
+
+    A reading is a CPU figure or a dict of Stats overrides; a "page" key moves the
+    loop's page behind its back, the way a lost page switch would.
+    """
+    monkeypatch.setenv("PIRATEBOX_EPD_INTERVAL", "0")
+    monkeypatch.setenv("PIRATEBOX_EPD_FULL_REFRESH_EVERY", "3")
+    monkeypatch.setenv("PIRATEBOX_EPD_LOGO", str(tmp_path / "no-logo.png"))
+    monkeypatch.setattr(sys, "argv", ["epaper_hat.py", "--buttons", "none"])
+    monkeypatch.setattr(epaper.AddressWatcher, "start", lambda self: False)
+
+    draws = []
+    states = []
+
+    def fake_driver(*args, **kwargs):
+        """Record every draw instead of blinking anything."""
+        return epaper.DisplayDriver(
+            epd=types.SimpleNamespace(),
+            width=176,
+            height=264,
+            init=lambda: None,
+            sleep=lambda: None,
+            clear=lambda: None,
+            draw=lambda image, full, bbox=None: draws.append((full, image.tobytes())),
+        )
+
+    def spy_state(**kwargs):
+        """Hand main() a real State and keep a handle on it."""
+        states.append(State(**kwargs))
+        return states[-1]
+
+    State = epaper.State
+    monkeypatch.setattr(epaper, "_load_driver", fake_driver)
+    monkeypatch.setattr(epaper, "State", spy_state)
+
+    def run(readings):
+        draws.clear()
+        readings = iter(readings)
+
+        def fake_stats(*args):
+            """Serve the scripted readings, then stop the loop like Ctrl-C would."""
+            for reading in readings:
+                overrides = dict(reading) if isinstance(reading, dict) else {"cpu_usage": reading}
+                if "page" in overrides:
+                    states[-1].page = overrides.pop("page")
+                return dataclasses.replace(BASE_STATS, **overrides)
+            raise KeyboardInterrupt
+
+        monkeypatch.setattr(epaper, "_collect_stats", fake_stats)
+        epaper.main()
+        return list(draws)
+
+    return run
+
+
+def test_due_full_refresh_redraws_an_old_full_frame(run_panel):
+    """A frame matching the last full refresh still goes out once partials drew over it."""
+    draws = run_panel([10, 50, 90, 10])
+    assert [full for full, _ in draws] == [True, False, False, True]
+    assert draws[3][1] == draws[0][1]
+
+
+def test_thresholds_compare_against_the_frame_on_the_panel(run_panel):
+    """After the redraw, a small wiggle is measured from what the panel shows, not from 90."""
+    draws = run_panel([10, 50, 90, 10, 12])
+    assert len(draws) == 4
+    assert draws[-1][1] == draws[0][1]
+
+
+def test_restamp_never_lands_on_another_pages_frame(run_panel):
+    """A new clock on a frame from another page is a full render of the current page."""
+    switched = run_panel([10, {"page": 1, "timestamp": "11:12"}])
+    fresh = run_panel([{"page": 1, "timestamp": "11:12"}])
+    assert len(switched) == 2
+    assert switched[-1][1] == fresh[-1][1]
+
+
+def test_address_event_expires_the_ip_right_after_boot(monkeypatch):
+    """A netlink event invalidates the cached IP even while the monotonic clock reads ~0."""
+    monkeypatch.setattr(epaper.time, "monotonic", lambda: 5.0)
+    monkeypatch.setitem(epaper._IP_CACHE, "value", "10.0.0.1")
+    monkeypatch.setitem(epaper._IP_CACHE, "ts", 4.0)
+    monkeypatch.setattr(epaper, "_resolve_ip", lambda: "192.168.4.1")
+
+    watcher = epaper.AddressWatcher()
+
+    class OneEvent:
+        """Deliver a single address event, then hang up."""
+
+        def recv(self, size):
+            watcher._stop.set()
+            return b"event"
+
+    watcher._sock = OneEvent()
+    watcher._run()
+    assert epaper._read_ip() == "192.168.4.1"
+
+
+class FakeWaveshare:
+    """Just enough of a Waveshare 2.7" EPD to be probed, packed, and partially refreshed."""
+
+    width = 176
+    height = 264
+
+    def __init__(self):
+        self.partials = []
+
+    def init(self):
+        pass
+
+    def sleep(self):
+        pass
+
+    def Clear(self, color):
+        pass
+
+    def display(self, buffer):
+        pass
+
+    def getbuffer(self, image):
+        if image.size == (self.width, self.height):
+            return bytearray(image.tobytes())
+        return bytearray(image.transpose(epaper.Image.Transpose.ROTATE_90).tobytes())
+
+    def display_Partial(self, Image, Xstart, Ystart, Xend, Yend):
+        self.partials.append((bytes(Image), Xstart, Ystart, Xend, Yend))
+
+
+def _waveshare_driver(monkeypatch, module_name):
+    """Load the Waveshare path against a fake module registered under module_name."""
+    module = types.ModuleType(f"waveshare_epd.{module_name}")
+    module.EPD = FakeWaveshare
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    return epaper._load_driver("waveshare_epd", module_hint=module_name)
+
+
+def _frame_with_box():
+    """A white frame with a black block straddling byte boundaries on x."""
+    epaper._lazy_pil()
+    image = epaper.Image.new("1", (FakeWaveshare.width, FakeWaveshare.height), 1)
+    image.paste(0, (13, 40, 50, 60))
+    return image
+
+
+def test_windowed_partial_sends_only_the_window_rows(monkeypatch):
+    """The V2 module gets the byte-aligned window's rows and its coordinates, nothing more."""
+    driver = _waveshare_driver(monkeypatch, "epd2in7_V2")
+    image = _frame_with_box()
+    driver.draw(image, False, (13, 40, 50, 60))
+
+    [(buffer, x0, y0, x1, y1)] = driver.epd.partials
+    assert (x0, y0, x1, y1) == (8, 40, 56, 60)
+    assert buffer == image.crop((8, 40, 56, 60)).tobytes()
+
+
+def test_unverified_windowed_partial_gets_the_whole_frame(monkeypatch):
+    """A module with an unknown buffer layout gets the full frame over the full panel."""
+    driver = _waveshare_driver(monkeypatch, "epd2in7")
+    image = _frame_with_box()
+    driver.draw(image, False, (13, 40, 50, 60))
+
+    [(buffer, *window)] = driver.epd.partials
+    assert window == [0, 0, FakeWaveshare.width, FakeWaveshare.height]
+    assert buffer == image.tobytes()
+
+
+def test_button_presses_run_on_the_waiting_thread():
+    """A press from a GPIO thread only queues; the handler runs on the loop that waits."""
+    watcher = epaper.ButtonWatcher(epaper.ButtonConfig(pins=[], pull_up=True), handler=None)
+    ran_on = []
+    fire = watcher._wrap(lambda: ran_on.append(threading.current_thread()))
+
+    gpio_thread = threading.Thread(target=fire)
+    gpio_thread.start()
+    gpio_thread.join()
+    assert ran_on == []
+
+    assert watcher.wait(1.0)
+    assert ran_on == [threading.current_thread()]
@@ -30,3 +30,18 @@ def test_download_missing_file(client):
     """Missing file ids should return 404."""
     response = client.get("/files/999/download")
     assert response.status_code == 404
+
+
+def test_download_revalidates_with_etag(client, sample_file):
+    """Repeat downloads with a matching ETag should get a bodiless 304."""
+    file_tuple, _ = sample_file
+    client.post("/files/upload", files={"file": file_tuple}, follow_redirects=False)
+    file_id = db.list_files()[0].id
+
+    first = client.get(f"/files/{file_id}/download")
+    etag = first.headers["etag"]
+    assert etag == f'"{db.get_file(file_id).sha256}"'
+
+    again = client.get(f"/files/{file_id}/download", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""